@@ -0,0 +1,3 @@
+"""
+修仙RPG插件性能测试工具
+"""
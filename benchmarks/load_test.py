@@ -0,0 +1,222 @@
+# astrbot_plugin_cultivation/benchmarks/load_test.py
+"""
+无界面压测工具。
+用桩对象替代 AstrBot 的 Context / AstrMessageEvent，并用空 LLM 替代 LLMUtils，
+在临时目录的 SQLite 中让 N 个虚拟玩家并发执行指令，输出各指令的 p50/p95/p99 延迟和吞吐量。
+
+在 AstrBot 的 plugins 目录下运行：
+    python -m astrbot_plugin_cultivation.benchmarks.load_test --players 1000 --commands 20
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+from collections import defaultdict
+from typing import Dict, Any, List
+
+from .. import main as plugin_main
+from ..database.db_manager import DatabaseManager
+from ..systems.sqlite_store import side_store
+from ..utils.constants import RECIPES_DATA, ALCHEMY_DATA
+from ..utils.llm_utils import LLMUtils
+
+# 指令名 -> 默认权重
+DEFAULT_MIX = {"探索": 4, "战斗": 3, "采集": 2, "锻造": 1, "炼丹": 1, "签到": 1}
+
+
+class StubEvent:
+    """最小化的 AstrMessageEvent 替身"""
+
+    def __init__(self, sender_id: str, message_str: str = ""):
+        self.sender_id = sender_id
+        self.message_str = message_str
+
+    def get_sender_id(self) -> str:
+        return self.sender_id
+
+    def get_sender_name(self) -> str:
+        return f"道友{self.sender_id}"
+
+    def plain_result(self, text: str) -> str:
+        return text
+
+
+class StubContext:
+    """最小化的 Context 替身，不提供任何 LLM 服务"""
+
+    def get_using_provider(self):
+        return None
+
+
+class NullLLMUtils:
+    """空 LLM：所有生成方法立即返回空内容，压测结果只反映游戏逻辑与存储开销"""
+
+    def __init__(self, context=None):
+        self.context = context
+
+    def __getattr__(self, name: str):
+        async def _noop(*args, **kwargs):
+            return None if name == "generate_alchemy_recipe" else ""
+        return _noop
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def _parse_mix(text: str) -> Dict[str, int]:
+    if not text:
+        return dict(DEFAULT_MIX)
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = int(weight or 1)
+    return mix
+
+
+def _build_calls(plugin) -> Dict[str, Any]:
+    """指令名 -> 以事件为参数、返回异步生成器的调用"""
+    craft_target = next(iter(RECIPES_DATA), "")
+    pill_target = next(iter(ALCHEMY_DATA.get("pills", {})), "")
+    return {
+        "探索": lambda event: plugin.explore(event),
+        "战斗": lambda event: plugin.attack(event),
+        "逃跑": lambda event: plugin.flee(event),
+        "采集": lambda event: plugin.gather_resources(event),
+        "锻造": lambda event: plugin.craft_item(event, item_name=craft_target),
+        "炼丹": lambda event: plugin.alchemy(event, pill_target),
+        "签到": lambda event: plugin.daily_checkin(event),
+        "状态": lambda event: plugin.status(event),
+    }
+
+
+async def _run_command(call, event: StubEvent) -> None:
+    async for _ in call(event):
+        pass
+
+
+async def _player_loop(calls: Dict[str, Any], sender_id: str, commands: int, names: List[str],
+                       weights: List[int], latencies: Dict[str, List[float]], errors: Dict[str, int]):
+    event = StubEvent(sender_id)
+    for name in random.choices(names, weights=weights, k=commands):
+        start = time.perf_counter()
+        try:
+            await _run_command(calls[name], event)
+        except Exception:
+            errors[name] += 1
+        latencies[name].append(time.perf_counter() - start)
+
+
+async def run_load_test(players: int = 200, commands: int = 20, mix: Dict[str, int] = None,
+                        seed: int = None) -> Dict[str, Any]:
+    """执行一次压测，返回按指令汇总的延迟统计"""
+    random.seed(seed)
+    mix = mix or dict(DEFAULT_MIX)
+
+    cwd = os.getcwd()
+    side_store_path = side_store.path
+    with tempfile.TemporaryDirectory(prefix="cultivation_bench_") as workdir:
+        os.chdir(workdir)
+        # 替换 LLM 工具与数据库后再实例化插件，保证所有系统拿到的都是空 LLM 和临时库，结束后恢复
+        plugin_main.LLMUtils = NullLLMUtils
+        plugin_main.DatabaseManager = lambda: DatabaseManager(os.path.join(workdir, "cultivation_bench.db"))
+        side_store.path = os.path.join(workdir, "cultivation_bench_market.db")
+        try:
+            return await _run_plugin(players, commands, mix)
+        finally:
+            plugin_main.LLMUtils = LLMUtils
+            plugin_main.DatabaseManager = DatabaseManager
+            side_store.path = side_store_path
+            os.chdir(cwd)
+
+
+async def _run_plugin(players: int, commands: int, mix: Dict[str, int]) -> Dict[str, Any]:
+    plugin = plugin_main.CultivationPlugin(StubContext(), {})
+    calls = _build_calls(plugin)
+    unknown = [name for name in mix if name not in calls]
+    if unknown:
+        raise ValueError(f"不支持的压测指令: {', '.join(unknown)}")
+
+    await plugin.initialize()
+    try:
+        sender_ids = [f"bench_{i}" for i in range(players)]
+        for sender_id in sender_ids:
+            await _run_command(lambda event: plugin.start_game(event, character_name=f"压测{sender_id}"),
+                               StubEvent(sender_id))
+
+        latencies: Dict[str, List[float]] = defaultdict(list)
+        errors: Dict[str, int] = defaultdict(int)
+        names, weights = list(mix), list(mix.values())
+
+        start = time.perf_counter()
+        await asyncio.gather(*(
+            _player_loop(calls, sender_id, commands, names, weights, latencies, errors)
+            for sender_id in sender_ids
+        ))
+        elapsed = time.perf_counter() - start
+        # 在插件卸载前记录各层的运行统计
+        stats = {
+            "角色缓存": plugin.db_manager.get_stats(),
+            "写入队列": {
+                "batches_committed": plugin.save_queue.batches_committed,
+                "saves_coalesced": plugin.save_queue.saves_coalesced,
+            },
+            "LLM缓存": plugin.llm_cache.get_stats(),
+            "LLM调度": plugin.llm_scheduler.get_stats(),
+        }
+    finally:
+        await plugin.terminate()
+
+    report: Dict[str, Any] = {"players": players, "elapsed": elapsed, "commands": {}, "stats": stats}
+    total = 0
+    for name, values in latencies.items():
+        values.sort()
+        total += len(values)
+        report["commands"][name] = {
+            "count": len(values),
+            "errors": errors.get(name, 0),
+            "p50_ms": _percentile(values, 50) * 1000,
+            "p95_ms": _percentile(values, 95) * 1000,
+            "p99_ms": _percentile(values, 99) * 1000,
+        }
+    report["total"] = total
+    report["throughput"] = total / elapsed if elapsed else 0.0
+    return report
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    lines = [
+        f"玩家数: {report['players']}  指令总数: {report['total']}  "
+        f"耗时: {report['elapsed']:.2f}s  吞吐: {report['throughput']:.1f} 条/秒",
+        f"{'指令':<6} {'次数':>8} {'错误':>6} {'p50(ms)':>9} {'p95(ms)':>9} {'p99(ms)':>9}",
+    ]
+    for name, stats in sorted(report["commands"].items()):
+        lines.append(
+            f"{name:<6} {stats['count']:>8} {stats['errors']:>6} "
+            f"{stats['p50_ms']:>9.2f} {stats['p95_ms']:>9.2f} {stats['p99_ms']:>9.2f}"
+        )
+    for layer, stats in report["stats"].items():
+        lines.append(f"{layer}: " + "  ".join(f"{key}={value}" for key, value in stats.items()))
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="修仙RPG插件压测")
+    parser.add_argument("--players", type=int, default=200, help="并发虚拟玩家数")
+    parser.add_argument("--commands", type=int, default=20, help="每个玩家执行的指令数")
+    parser.add_argument("--mix", default="", help="指令权重，例如 探索=4,战斗=3,采集=2")
+    parser.add_argument("--seed", type=int, default=None, help="随机种子")
+    args = parser.parse_args()
+
+    report = asyncio.run(run_load_test(args.players, args.commands, _parse_mix(args.mix), args.seed))
+    print(format_report(report))
+
+
+if __name__ == "__main__":
+    main()
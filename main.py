@@ -18,25 +18,129 @@ from .commands.basic import BasicCommands
 from .commands.cultivation import CultivationCommands
 from .commands.exploration import ExplorationCommands
 from .systems.crafting_system import CraftingSystem
+from .systems.alchemy_system import AlchemySystem
 from .systems.gathering_system import GatheringSystem
+from .systems.character_cache import CharacterCache
+from .systems.save_queue import SaveQueue
+from .systems.lock_manager import CharacterLockManager
+from .systems.combat import CombatSystem
+from .systems.combat_session import combat_sessions
+from .systems.llm_cache import LLMTextCache, CachedLLMUtils
+from .systems.flavor_text import flavor_text
+from .systems.flavor_pool import flavor_pool
+from .systems.llm_scheduler import LLMScheduler, CircuitBreaker
+from .systems.llm_batcher import LLMBatcher
+from .systems.shop_stock import stock_ledger
+from .systems.sqlite_store import side_store
+from .systems.auction_house import auction_house
+from .systems.recipe_index import recipe_index, FORGE
+from .systems.recipe_journal import recipe_journal
+from .systems.idle_progress import idle_progress, IN_RETREAT_MESSAGE
+from .systems.leaderboard import leaderboard
 
 @register("astrbot_plugin_cultivation", "kure29", "基於AstrBot的史詩級修真RPG遊戲插件", "2.0.0", "https://github.com/kure29/astrbot_plugin_cultivation")
 class CultivationPlugin(Star):
     def __init__(self, context: Context, config: AstrBotConfig):
         super().__init__(context)
         self.config_manager = config # <-- 使用导入的config实例
-        self.db_manager = DatabaseManager()
-        self.llm_utils = LLMUtils(context)
+        self.max_leaderboard_entries = config.get("display_settings", {}).get("max_leaderboard_entries", 10)
+        admin_settings = config.get("admin_settings", {})
+        # 批量写入队列：合并同一角色的保存，多个角色共用一个事务提交
+        self.save_queue = SaveQueue(
+            DatabaseManager(),
+            tick=admin_settings.get("save_batch_interval", 0.2),
+            max_latency=admin_settings.get("save_max_latency", 1.0),
+        )
+        # 挂机收益：真元、生命恢复与闭关经验在读取角色时按公式结算
+        cultivation_settings = config.get("cultivation_settings", {})
+        idle_progress.configure(
+            qi_regen_per_hour=cultivation_settings.get("qi_regen_per_hour", 0.25),
+            hp_regen_per_hour=cultivation_settings.get("hp_regen_per_hour", 0.25),
+            retreat_sessions_per_hour=cultivation_settings.get("retreat_sessions_per_hour", 2),
+            retreat_min_hours=cultivation_settings.get("retreat_min_hours", 0.5),
+            retreat_max_efficiency_hours=cultivation_settings.get("retreat_max_efficiency_hours", 12),
+        )
+        # 角色写回缓存：所有系统共享，热玩家直接走内存，仅脏数据定时落盘
+        self.db_manager = CharacterCache(
+            self.save_queue,
+            max_size=admin_settings.get("character_cache_size", 1000),
+            flush_interval=admin_settings.get("cache_flush_interval", 5),
+            accrual=idle_progress.settle,
+            on_save=leaderboard.update,
+        )
+        # 按玩家加锁：同一玩家的指令串行，不同玩家并行
+        self.locks = CharacterLockManager()
+        llm_settings = config.get("llm_settings", {})
+        # LLM文案缓存：同类提示词复用已生成的文案
+        self.llm_cache = LLMTextCache(
+            max_keys=llm_settings.get("llm_cache_size", 100),
+            variants=llm_settings.get("llm_cache_variants", 3),
+            ttl=llm_settings.get("llm_cache_ttl", 3600),
+        )
+        # LLM调度：限制并发、按玩家轮转、合并相同请求，超时或过慢时熔断并改用预设文案
+        self.llm_scheduler = LLMScheduler(
+            LLMUtils(context),
+            max_concurrency=llm_settings.get("llm_max_concurrency", 4),
+            timeout=llm_settings.get("llm_timeout", 30),
+            breaker=CircuitBreaker(
+                failure_threshold=llm_settings.get("llm_breaker_threshold", 5),
+                reset_timeout=llm_settings.get("llm_breaker_reset", 60),
+            ),
+        )
+        llm_backend = self.llm_scheduler
+        # 微批处理：短时间内的多条文案请求合并为一次LLM调用
+        self.llm_batcher = LLMBatcher(
+            self.llm_scheduler,
+            window=llm_settings.get("llm_batch_window", 0.05),
+            max_batch=llm_settings.get("llm_batch_size", 8),
+            timeout=llm_settings.get("llm_timeout", 30),
+        )
+        self.llm_utils = CachedLLMUtils(self.llm_batcher, self.llm_cache)
+        # 异步文案：先返回结算结果，LLM文案生成后作为后续消息发送
+        flavor_text.configure(
+            enabled=llm_settings.get("async_llm_descriptions", False),
+            timeout=llm_settings.get("llm_timeout", 30),
+        )
+        # 预生成文案池：空闲时后台补充，探索/遇敌/渡劫直接取用
+        game_settings = config.get("game_settings", {})
+        flavor_pool.configure(
+            llm_utils=llm_backend,
+            pool_size=llm_settings.get("flavor_pool_size", 5),
+            cooldown=game_settings.get("llm_call_cooldown", 10),
+        )
+        if game_settings.get("enable_llm_descriptions", True):
+            flavor_pool.want((location, event_type) for location in LOCATIONS for event_type in ("normal", "monster"))
         self.basic_commands = BasicCommands(self.db_manager, self.llm_utils)
         self.cultivation_commands = CultivationCommands(self.db_manager, self.llm_utils)
         self.exploration_commands = ExplorationCommands(self.db_manager, self.llm_utils)
         self.crafting_system = CraftingSystem(self.db_manager)
+        self.alchemy_system = AlchemySystem(self.db_manager, self.llm_utils)
         self.gathering_system = GatheringSystem(self.db_manager)
+        combat_sessions.configure(max_sessions=admin_settings.get("max_concurrent_combats", 100))
+        self.combat_system = CombatSystem(self.db_manager, self.llm_utils)
+        economy_settings = config.get("economy_settings", {})
+        stock_ledger.configure(default_restock_interval=economy_settings.get("shop_restock_interval", 3600))
+        auction_house.configure(
+            enabled=config.get("advanced_features", {}).get("enable_auction_house", False),
+            duration=economy_settings.get("auction_duration_hours", 24) * 3600,
+            fee_rate=economy_settings.get("auction_fee_rate", 0.05),
+            max_listings_per_player=economy_settings.get("auction_max_listings", 10),
+        )
 
         logger.info("修仙RPG完整版插件初始化成功")
 
     async def initialize(self):
         await self.db_manager.init_database()
+        self.save_queue.start()
+        self.db_manager.start()
+        await stock_ledger.start()
+        await recipe_journal.start()
+        await idle_progress.start()
+        await leaderboard.start(self.db_manager)
+        if auction_house.enabled:
+            await auction_house.start(self.db_manager)
+        self.llm_scheduler.start()
+        flavor_pool.start()
         # The new config_manager loads data automatically on import,
         # so we can remove the manual loading calls here.
         logger.info("修仙插件数据加载完成。")
@@ -45,11 +149,14 @@ class CultivationPlugin(Star):
     # --- 指令註冊 ---
     @filter.command("前往")
     async def travel(self, event: AstrMessageEvent, *, destination: str = ""):
-        async for result in self.exploration_commands.travel_to(event, destination.strip()): yield result
+        async with self.locks.lock(event.get_sender_id()):
+            if idle_progress.is_retreating(event.get_sender_id()): yield event.plain_result(IN_RETREAT_MESSAGE); return
+            async for result in self.exploration_commands.travel_to(event, destination.strip()): yield result
 
     @filter.command("开始游戏", alias={'创建角色', '开始修仙'})
     async def start_game(self, event: AstrMessageEvent, *, character_name: str = ""):
-        async for result in self.basic_commands.start_game(event, character_name): yield result
+        async with self.locks.lock(event.get_sender_id()):
+            async for result in self.basic_commands.start_game(event, character_name): yield result
 
     @filter.command("帮助", alias={'指令', '菜单'})
     async def help(self, event: AstrMessageEvent):
@@ -65,35 +172,82 @@ class CultivationPlugin(Star):
 
     @filter.command("签到")
     async def daily_checkin(self, event: AstrMessageEvent):
-        async for result in self.basic_commands.daily_checkin(event): yield result
+        async with self.locks.lock(event.get_sender_id()):
+            async for result in self.basic_commands.daily_checkin(event): yield result
 
     @filter.command("排行榜", alias={'排名', '榜单'})
-    async def leaderboard(self, event: AstrMessageEvent):
-        async for result in self.basic_commands.leaderboard(event): yield result
+    async def show_leaderboard(self, event: AstrMessageEvent, board: str = ""):
+        if not leaderboard.complete:
+            # 索引尚未从角色表完整播种，沿用原有的角色表查询
+            async for result in self.basic_commands.leaderboard(event): yield result
+            return
+        # 排行榜索引随每次保存增量更新，这里只取前 max_leaderboard_entries 名和自己的名次
+        by_power = board.strip() == "战力"
+        index = leaderboard.by_power if by_power else leaderboard.by_level
+        top = leaderboard.top(index, self.max_leaderboard_entries)
+        if not top:
+            yield event.plain_result("排行榜上暂无道友。")
+            return
+        lines = ["【战力排行榜】\n" if by_power else "【等级排行榜】\n"]
+        for position, (_, entry) in enumerate(top, 1):
+            detail = f"战力 {entry.power}" if by_power else f"等级 {entry.level} (经验 {entry.exp})"
+            lines.append(f"{position}. {entry.name} - {detail}\n")
+        rank = index.rank(event.get_sender_id())
+        lines.append(f"\n你当前排第 {rank} 名（共 {len(index)} 人）" if rank else "\n你尚未上榜")
+        if not by_power:
+            lines.append("\n查看战力榜: /排行榜 战力")
+        yield event.plain_result("".join(lines))
 
     @filter.command("战力", alias={'评估', '评级'})
     async def power_rating(self, event: AstrMessageEvent):
         async for result in self.basic_commands.power_rating(event): yield result
+        rank = leaderboard.by_power.rank(event.get_sender_id()) if leaderboard.complete else None
+        if rank:
+            yield event.plain_result(f"你的战力在 {len(leaderboard.by_power)} 位道友中排第 {rank} 名。")
 
     @filter.command("改名", alias={'重命名', '更换道号'})
     async def rename(self, event: AstrMessageEvent, new_name: str):
-        async for result in self.basic_commands.rename(event, new_name): yield result
+        async with self.locks.lock(event.get_sender_id()):
+            async for result in self.basic_commands.rename(event, new_name): yield result
 
     @filter.command("使用", alias={'服用', '装备', '穿戴'})
     async def use_item(self, event: AstrMessageEvent, *, args: str):
-        async for result in self.basic_commands.use_item(event, args): yield result
+        async with self.locks.lock(event.get_sender_id()):
+            async for result in self.basic_commands.use_item(event, args): yield result
 
     @filter.command("闭关", alias={'練功', '打坐'})
     async def start_retreat(self, event: AstrMessageEvent):
-        async for result in self.cultivation_commands.start_retreat(event): yield result
+        user_id = event.get_sender_id()
+        async with self.locks.lock(user_id):
+            character = await self.db_manager.get_character(user_id)
+            if not character: yield event.plain_result("你尚未踏入仙途。"); return
+            result = idle_progress.start_retreat(user_id, character)
+            yield event.plain_result(result["message"])
 
     @filter.command("出关", alias={'结束闭关'})
     async def end_retreat(self, event: AstrMessageEvent):
-        async for result in self.cultivation_commands.end_retreat(event): yield result
+        user_id = event.get_sender_id()
+        async with self.locks.lock(user_id):
+            character = await self.db_manager.get_character(user_id)
+            if not character: yield event.plain_result("你尚未踏入仙途。"); return
+            result = idle_progress.end_retreat(user_id, character)
+            if result["success"]:
+                await self.db_manager.save_character(character)
+            yield event.plain_result(result["message"])
 
     @filter.command("炼丹")
-    async def alchemy(self, event: AstrMessageEvent, pill_type: str = ""):
-        async for result in self.cultivation_commands.alchemy(event, pill_type): yield result
+    async def alchemy(self, event: AstrMessageEvent, pill_type: str = "", count: int = 1):
+        async with self.locks.lock(event.get_sender_id()):
+            if not pill_type:
+                # 未指定丹药时沿用原有的丹方说明
+                async for result in self.cultivation_commands.alchemy(event, pill_type): yield result
+                return
+            if idle_progress.is_retreating(event.get_sender_id()): yield event.plain_result(IN_RETREAT_MESSAGE); return
+            # 单炉与连续炼制走同一套结算：一次读取角色、一次结算、一次保存
+            character = await self.db_manager.get_character(event.get_sender_id())
+            if not character: yield event.plain_result("你尚未踏入仙途。"); return
+            result = await self.alchemy_system.perform_alchemy(character, pill_type.strip(), count)
+            yield event.plain_result(result["message"])
 
     @filter.command("境界", alias={'等级系统', '修为'})
     async def realm_info(self, event: AstrMessageEvent):
@@ -105,26 +259,59 @@ class CultivationPlugin(Star):
 
     @filter.command("探索", alias={'冒险', '历练'})
     async def explore(self, event: AstrMessageEvent):
-        async for result in self.exploration_commands.explore(event): yield result
+        async with self.locks.lock(event.get_sender_id()):
+            if idle_progress.is_retreating(event.get_sender_id()): yield event.plain_result(IN_RETREAT_MESSAGE); return
+            async for result in self.exploration_commands.explore(event): yield result
+
+    async def _combat_session(self, character):
+        """取角色的战斗会话；过期或损坏的检查点被清除时才保存角色"""
+        if not character:
+            return None
+        stale_checkpoint = character.combat_state
+        session = self.combat_system.get_session(character)
+        if not session and stale_checkpoint and not character.combat_state:
+            await self.db_manager.save_character(character)
+        return session
+
+    @staticmethod
+    def _no_session_message(character) -> str:
+        if character and character.combat_state:
+            # 检查点仍在，只是同时战斗已满
+            return "此刻斗法之人太多，天地灵气紊乱，请稍后再试。"
+        return "你当前不在战斗中。"
 
     @filter.command("战斗", alias={'攻击', '出手'})
     async def attack(self, event: AstrMessageEvent):
-        character = await self.db_manager.get_character(event.get_sender_id())
-        if not character or not character.combat_state:
-            yield event.plain_result("你当前不在战斗中。")
-            return
-        combat_data = json.loads(character.combat_state)
-        async for result in self.combat_system.player_attack(character, combat_data):
-            yield result
+        async with self.locks.lock(event.get_sender_id()):
+            if idle_progress.is_retreating(event.get_sender_id()): yield event.plain_result(IN_RETREAT_MESSAGE); return
+            character = await self.db_manager.get_character(event.get_sender_id())
+            session = await self._combat_session(character)
+            if not session:
+                yield event.plain_result(self._no_session_message(character))
+                return
+            result = await self.combat_system.player_attack(character, session)
+            # 战斗回合只改内存，结束或到达检查点时才保存角色
+            if result.get("persist"):
+                await self.db_manager.save_character(character)
+            yield event.plain_result(result["message"])
+        # 释放玩家锁后再等待后台文案，不阻塞该玩家的下一条指令
+        description = await flavor_text.wait(result.get("description_task"))
+        if description:
+            yield event.plain_result(description)
 
     @filter.command("逃跑", alias={'逃离', '退避'})
     async def flee(self, event: AstrMessageEvent):
-        character = await self.db_manager.get_character(event.get_sender_id())
-        if not character or not character.combat_state:
-            yield event.plain_result("你当前不在战斗中。")
-            return
-        async for result in self.combat_system.attempt_flee(character):
-            yield result
+        async with self.locks.lock(event.get_sender_id()):
+            if idle_progress.is_retreating(event.get_sender_id()): yield event.plain_result(IN_RETREAT_MESSAGE); return
+            character = await self.db_manager.get_character(event.get_sender_id())
+            session = await self._combat_session(character)
+            if not session:
+                yield event.plain_result(self._no_session_message(character))
+                return
+            result = await self.combat_system.attempt_flee(character, session)
+            if result.get("persist"):
+                await self.db_manager.save_character(character)
+            yield event.plain_result(result["message"])
 
     @filter.permission_type(filter.PermissionType.ADMIN)
     @filter.command("重置数据")
@@ -133,7 +320,16 @@ class CultivationPlugin(Star):
             yield event.plain_result("危险操作！使用 `/重置数据 确认重置` 来确认重置所有数据")
             return
         try:
+            # 先排空角色缓存与写入队列，重置前的改动不会在重置后被写回
+            await self.db_manager.flush()
+            await self.save_queue.flush()
             await self.db_manager.reset_all_data()
+            # 内存中的战斗、挂机、排行、商店库存与拍卖行数据一并清空，新角色不会接上旧数据
+            combat_sessions.reset()
+            await idle_progress.reset()
+            await leaderboard.reset()
+            await stock_ledger.reset()
+            await auction_house.reset()
             yield event.plain_result("所有游戏数据已重置")
         except Exception as e:
             logger.error(f"重置数据失败: {e}")
@@ -141,28 +337,115 @@ class CultivationPlugin(Star):
 
     @filter.command("商店", alias={'shop'})
     async def shop(self, event: AstrMessageEvent, action: str = "", item_name: str = "", quantity: int = 1):
-        async for result in self.basic_commands.shop(event, action, item_name, quantity): yield result
+        async with self.locks.lock(event.get_sender_id()):
+            async for result in self.basic_commands.shop(event, action, item_name, quantity): yield result
 
     @filter.command("购买", alias={'buy'})
     async def buy(self, event: AstrMessageEvent, item_name: str = "", quantity: int = 1):
-        async for result in self.basic_commands.shop(event, "购买", item_name, quantity): yield result
+        async with self.locks.lock(event.get_sender_id()):
+            async for result in self.basic_commands.shop(event, "购买", item_name, quantity): yield result
 
     @filter.command("锻造")
     async def craft_item(self, event: AstrMessageEvent, *, item_name: str = ""):
-        character = await self.db_manager.get_character(event.get_sender_id())
-        if not character: yield event.plain_result("你尚未踏入仙途。"); return
-        if not item_name: yield event.plain_result("你要锻造何物？\n(指令格式: /锻造 [装备名])"); return
-        result = await self.crafting_system.perform_crafting(character, item_name.strip())
-        yield event.plain_result(result["message"])
+        async with self.locks.lock(event.get_sender_id()):
+            if idle_progress.is_retreating(event.get_sender_id()): yield event.plain_result(IN_RETREAT_MESSAGE); return
+            character = await self.db_manager.get_character(event.get_sender_id())
+            if not character: yield event.plain_result("你尚未踏入仙途。"); return
+            if not item_name: yield event.plain_result("你要锻造何物？\n(指令格式: /锻造 [装备名] [件数])"); return
+            name, _, count = item_name.strip().rpartition(" ")
+            if name and count.isdigit():
+                result = await self.crafting_system.perform_crafting(character, name.strip(), int(count))
+            else:
+                result = await self.crafting_system.perform_crafting(character, item_name.strip())
+            yield event.plain_result(result["message"])
 
     @filter.command("采集")
     async def gather_resources(self, event: AstrMessageEvent):
+        async with self.locks.lock(event.get_sender_id()):
+            if idle_progress.is_retreating(event.get_sender_id()): yield event.plain_result(IN_RETREAT_MESSAGE); return
+            character = await self.db_manager.get_character(event.get_sender_id())
+            if not character: yield event.plain_result("你尚未踏入仙途。"); return
+            result = await self.gathering_system.perform_gathering(character)
+            yield event.plain_result(result["message"])
+
+    @filter.command("可制作", alias={'可锻造', '可炼丹', '配方'})
+    async def craftable(self, event: AstrMessageEvent):
         character = await self.db_manager.get_character(event.get_sender_id())
         if not character: yield event.plain_result("你尚未踏入仙途。"); return
-        result = await self.gathering_system.perform_gathering(character)
-        yield event.plain_result(result["message"])
+        entries = recipe_index.craftable(character)
+        if not entries:
+            yield event.plain_result("以你储物袋中的材料，眼下什么也做不出来。")
+            return
+        lines = ["【当前材料可制作】\n"]
+        for entry in entries:
+            materials = "、".join(f"{material}x{qty}" for material, qty in entry.materials) or "无需材料"
+            command = "/锻造" if entry.kind == FORGE else "/炼丹"
+            lines.append(f"- [{entry.kind}] {entry.name} ({materials}) → {command} {entry.name}\n")
+        yield event.plain_result("".join(lines))
+
+    @filter.command("拍卖行", alias={'拍卖', 'auction'})
+    async def auction(self, event: AstrMessageEvent, action: str = "", arg1: str = "", arg2: int = 1, arg3: int = 0):
+        if not auction_house.enabled:
+            yield event.plain_result("拍卖行尚未开放。")
+            return
+        user_id = event.get_sender_id()
+        if action in ("", "查看", "浏览"):
+            if arg1:
+                listings = auction_house.cheapest(arg1.strip())
+                if not listings: yield event.plain_result(f"拍卖行中暂无“{arg1}”。"); return
+                lines = [f"【拍卖行·{arg1}】(价格从低到高)\n"]
+                lines.extend(f"[{l.listing_id}] {l.item_name} x{l.quantity} - {l.price} 灵石 (卖家: {l.seller_name})\n" for l in listings)
+            else:
+                overview = auction_house.overview()
+                lines = ["【拍卖行】\n"]
+                lines.extend(f"- {name}: {count} 件在售，最低 {low} 灵石\n" for name, count, low in overview)
+                if not overview: lines.append("暂无拍品。\n")
+                lines.append("\n/拍卖行 查看 [物品名] | 上架 [物品名] [数量] [总价] | 购买 [编号或物品名] | 下架 [编号] | 我的 | 领取")
+            yield event.plain_result("".join(lines))
+            return
+        if action == "我的":
+            listings = auction_house.listings_of(user_id)
+            claims = auction_house.claims_of(user_id)
+            lines = ["【我的拍品】\n"]
+            lines.extend(f"[{l.listing_id}] {l.item_name} x{l.quantity} - {l.price} 灵石\n" for l in listings)
+            if not listings: lines.append("暂无在售拍品。\n")
+            if claims: lines.append(f"\n有 {len(claims)} 笔待领取，使用 /拍卖行 领取")
+            yield event.plain_result("".join(lines))
+            return
+        async with self.locks.lock(user_id):
+            character = await self.db_manager.get_character(user_id)
+            if not character: yield event.plain_result("你尚未踏入仙途。"); return
+            if action == "上架":
+                if not arg1 or arg3 <= 0: yield event.plain_result("指令格式: /拍卖行 上架 [物品名] [数量] [总价]"); return
+                result = await auction_house.create_listing(user_id, character, arg1.strip(), arg2, arg3)
+            elif action == "购买":
+                if not arg1: yield event.plain_result("指令格式: /拍卖行 购买 [编号或物品名]"); return
+                if arg1.isdigit():
+                    result = await auction_house.buy(user_id, character, int(arg1))
+                else:
+                    result = await auction_house.buy_cheapest(user_id, character, arg1.strip())
+            elif action == "下架":
+                if not arg1.isdigit(): yield event.plain_result("指令格式: /拍卖行 下架 [编号]"); return
+                result = await auction_house.cancel(user_id, character, int(arg1))
+            elif action == "领取":
+                result = await auction_house.collect(user_id, character)
+            else:
+                yield event.plain_result("未知操作。可用: 查看、上架、购买、下架、我的、领取")
+                return
+            # 成功时拍卖行已立即写入角色
+            yield event.plain_result(result["message"])
 
     async def terminate(self):
+        await flavor_pool.stop()
+        await self.llm_scheduler.stop()
+        await recipe_journal.stop()
+        await idle_progress.stop()
+        await leaderboard.stop()
+        await stock_ledger.stop()
+        await auction_house.stop()
+        await side_store.close()
         if hasattr(self, 'db_manager'):
+            await self.db_manager.stop()
+            await self.save_queue.stop()
             await self.db_manager.close()
         logger.info("修仙RPG插件已卸载")
\ No newline at end of file
@@ -1,15 +1,18 @@
 # astrbot_plugin_cultivation/systems/alchemy_system.py
 
 import random
-import json
 import os
-from typing import Dict, Any, List
+from typing import Dict, Any
 
 from ..models.character import Character
 from ..database.db_manager import DatabaseManager  # <-- 修正：導入 DatabaseManager
 from ..utils.llm_utils import LLMUtils            # <-- 修正：導入 LLMUtils
 from ..utils.constants import ALCHEMY_DATA, ITEMS
-from ..utils.path_utils import PLUGIN_DATA_DIR     # <-- 修正：導入 PLUGIN_DATA_DIR
+from .inventory import consume
+from .recipe_journal import recipe_journal
+from .sampling import multinomial
+
+MAX_BATCH = 99
 
 class AlchemySystem:
     """
@@ -22,17 +25,18 @@ class AlchemySystem:
     def __init__(self, db_manager: DatabaseManager, llm_utils: LLMUtils):
         self.db_manager = db_manager
         self.llm_utils = llm_utils
-        # 注意：写入路径应该是 pills.json，但为了代码健壮性，保留 alchemy_data_path 的概念
-        # 在 perform_alchemy 中会使用具体的 pills.json 路径
+        # 新丹方由 recipe_journal 写入该目录下的 pills.json
         self.alchemy_data_path = os.path.join(os.path.dirname(__file__), '..', 'data')
 
 
-    async def perform_alchemy(self, character: Character, pill_name: str) -> Dict[str, Any]:
+    async def perform_alchemy(self, character: Character, pill_name: str, quantity: int = 1) -> Dict[str, Any]:
         """
         执行炼丹的核心方法。
+        quantity > 1 时连续炼制多炉：材料与灵石一次扣足，各炉结果一次性抽样，角色只保存一次。
         """
+        if not 1 <= quantity <= MAX_BATCH:
+            return {"success": False, "message": f"一次最多连续炼制 {MAX_BATCH} 炉。"}
         recipe = ALCHEMY_DATA["pills"].get(pill_name)
-        pills_data_path = os.path.join(self.alchemy_data_path, "pills.json") # 定义正确的写入路径
 
         if not recipe:
             # 丹方不存在，检查玩家是否为道祖
@@ -46,12 +50,10 @@ class AlchemySystem:
             if not recipe:
                 return {"success": False, "message": f"你虽已是道祖，但创造【{pill_name}】似乎还缺少一些灵感，天机未到。"}
             
-            # 将新生成的丹方永久写入 pills.json
+            # 新丹方立即生效，由丹方日志在后台写入 pills.json
             ALCHEMY_DATA["pills"][pill_name] = recipe
-            with open(pills_data_path, "w", encoding="utf-8") as f: # 使用正确的路径
-                json.dump(ALCHEMY_DATA["pills"], f, ensure_ascii=False, indent=4)
-            
             ITEMS[pill_name] = recipe
+            recipe_journal.record(pill_name, recipe)
 
         # --- 后续逻辑与之前类似，但现在是系统内部的方法 ---
 
@@ -61,23 +63,15 @@ class AlchemySystem:
         if required_realm and character.get_major_realm() != required_realm and character.get_major_realm() != "道祖": # 道祖可无视低级限制
              return {"success": False, "message": f"炼制【{pill_name}】失败：你的境界（{character.get_major_realm()}）未达到【{required_realm}】的要求。"}
 
-        # 材料检查
-        missing_items = []
-        for material, required_qty in recipe.get("materials", {}).items():
-            if not character.has_item(material, required_qty):
-                missing_items.append(f"{material}x{required_qty}")
-        
-        if missing_items:
-            return {"success": False, "message": f"炼制【{pill_name}】失败：缺少材料 {', '.join(missing_items)}。"}
-            
         # 灵石检查 (暂定为丹药价格的10%，LLM生成的丹方需要有价格)
-        cost = recipe.get("price", 100) // 10
+        cost = recipe.get("price", 100) // 10 * quantity
         if character.spirit_stones < cost:
             return {"success": False, "message": f"炼制【{pill_name}】失败：灵石不足，需要 {cost} 灵石。"}
 
-        # 2. 扣除资源
-        for material, required_qty in recipe.get("materials", {}).items():
-            character.remove_item(material, required_qty)
+        # 2. 检查并扣除材料 (先整体检查，缺任何一样都不扣)，再扣灵石
+        missing_items = consume(character, recipe.get("materials", {}), times=quantity)
+        if missing_items:
+            return {"success": False, "message": f"炼制【{pill_name}】失败：缺少材料 {', '.join(missing_items)}。"}
         character.spirit_stones -= cost
 
         # 3. 动态成功率判定 (遵循你的设计原则)
@@ -86,19 +80,25 @@ class AlchemySystem:
         luck_bonus = character.stats.luck * 0.01 # 气运加成
         final_success_rate = min(0.95, base_success_rate + luck_bonus)
 
-        # 4. 丰富的结果层次
-        roll = random.random()
-        message = f"你将药材投入丹炉，催动真火，开始炼制【{pill_name}】...\n\n"
-
-        if roll <= final_success_rate * 0.1: # 大成功 (10%概率)
-            num_pills = random.randint(2, 5)
+        # 4. 丰富的结果层次：大成功 (10%) / 成功 / 失败，多炉一次抽样
+        great, normal = multinomial(quantity, (final_success_rate * 0.1, final_success_rate * 0.9))
+        failed = quantity - great - normal
+        num_pills = sum(random.randint(2, 5) for _ in range(great)) + normal
+        if num_pills:
             character.add_item(pill_name, num_pills, "丹药", recipe.get("效果", ""))
-            message += f"丹炉霞光四射，丹香扑鼻！你福至心灵，一炉竟炼出了 {num_pills} 颗极品【{pill_name}】！"
-        elif roll <= final_success_rate: # 成功
-            character.add_item(pill_name, 1, "丹药", recipe.get("效果", ""))
-            message += f"丹炉嗡嗡作响，片刻后归于平静。一枚圆润的【{pill_name}】已然炼成！"
-        else: # 失败
-            message += f"突然，丹炉内传来一声闷响，一股焦糊味弥漫开来。唉，一炉珍贵的药材就此报废..."
-        
+
+        if quantity > 1:
+            message = f"你连开 {quantity} 炉，炼制【{pill_name}】...\n\n"
+            message += f"大成功 {great} 炉，成功 {normal} 炉，失败 {failed} 炉。\n"
+            message += f"共得【{pill_name}】x{num_pills}，消耗 {cost} 灵石。" if num_pills else "一炉丹药也未能炼成，药材尽数报废..."
+        else:
+            message = f"你将药材投入丹炉，催动真火，开始炼制【{pill_name}】...\n\n"
+            if great:
+                message += f"丹炉霞光四射，丹香扑鼻！你福至心灵，一炉竟炼出了 {num_pills} 颗极品【{pill_name}】！"
+            elif normal:
+                message += f"丹炉嗡嗡作响，片刻后归于平静。一枚圆润的【{pill_name}】已然炼成！"
+            else:
+                message += f"突然，丹炉内传来一声闷响，一股焦糊味弥漫开来。唉，一炉珍贵的药材就此报废..."
+
         await self.db_manager.save_character(character)
-        return {"success": True, "message": message}
\ No newline at end of file
+        return {"success": True, "message": message}
@@ -0,0 +1,474 @@
+# astrbot_plugin_cultivation/systems/auction_house.py
+
+import asyncio
+import heapq
+import json
+import time
+from bisect import bisect_left, insort
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+from astrbot.api import logger
+from ..models.character import Character
+from .character_cache import CharacterCache
+from ..utils.constants import ITEMS
+from .inventory import consume
+from .sqlite_store import SideTableStore, Statement, side_store
+
+
+def _dump_effect(effect: Any) -> Optional[str]:
+    return None if effect is None else json.dumps(effect, ensure_ascii=False)
+
+
+def _load_effect(raw: Optional[str]) -> Any:
+    return None if raw is None else json.loads(raw)
+
+
+class Listing:
+    __slots__ = ("listing_id", "seller_id", "seller_name", "item_name", "quantity", "price", "expires_at",
+                 "item_type", "description", "effect")
+
+    def __init__(self, listing_id: int, seller_id: str, seller_name: str, item_name: str,
+                 quantity: int, price: int, expires_at: float,
+                 item_type: str = "", description: str = "", effect: Any = None):
+        self.listing_id = listing_id
+        self.seller_id = seller_id
+        self.seller_name = seller_name
+        self.item_name = item_name
+        self.quantity = quantity
+        self.price = price  # 整批总价
+        self.expires_at = expires_at
+        # 上架时储物袋中该物品的类型、描述与效果，锻造或 LLM 生成的装备不在 ITEMS 中，须随挂单保存
+        self.item_type = item_type
+        self.description = description
+        self.effect = effect
+
+    def row(self) -> tuple:
+        return (self.listing_id, self.seller_id, self.seller_name, self.item_name,
+                self.quantity, self.price, self.expires_at,
+                self.item_type, self.description, _dump_effect(self.effect))
+
+
+class Claim(NamedTuple):
+    """待领取的物品或灵石（拍卖所得、过期退回）"""
+    item_name: str
+    quantity: int
+    spirit_stones: int
+    item_type: str = ""
+    description: str = ""
+    effect: Any = None
+
+
+class OrderBook:
+    """单个物品的挂单簿，按 (价格, 编号) 有序，最便宜的在最前"""
+
+    __slots__ = ("entries",)
+
+    def __init__(self):
+        self.entries: List[Tuple[int, int]] = []
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def add(self, listing: Listing):
+        insort(self.entries, (listing.price, listing.listing_id))
+
+    def remove(self, listing: Listing):
+        key = (listing.price, listing.listing_id)
+        index = bisect_left(self.entries, key)
+        if index < len(self.entries) and self.entries[index] == key:
+            del self.entries[index]
+
+    def __iter__(self) -> Iterator[int]:
+        """按价格从低到高逐个给出挂单编号"""
+        return (listing_id for _, listing_id in self.entries)
+
+    def cheapest(self, n: int) -> List[int]:
+        return [listing_id for _, listing_id in self.entries[:n]]
+
+
+class AuctionHouse:
+    """
+    玩家间拍卖行。
+    - 每种物品一个有序挂单簿，上架、下架、买入和浏览最便宜的若干件都不需要扫描全部挂单
+    - 所有挂单的过期时间放在同一个最小堆中，由一个后台任务统一处理，过期物品退回卖家待领取
+    - 成交、下架、上架与领取依次完成三步：把挂单和待领取记录写入附属库，改动角色，再立即把该角色写入角色库；
+      两个库分别提交，不是同一个事务。附属库写入失败时角色不做任何改动（上架时已扣下的物品原样退回）
+    - 挂单与待领取记录保存物品的类型、描述与效果，锻造品和 LLM 生成的装备转手后不会丢失属性
+    - 过期产生的数据库改动先排队，定时（或随下一次成交）在一个事务中批量写入
+    - 卖家不在线也能成交：货款与退回的物品记为待领取（保存在附属库中），使用 /拍卖行 领取 取回时才改动卖家角色
+    """
+
+    def __init__(self, store: SideTableStore, duration: float = 86400, fee_rate: float = 0.05,
+                 max_listings_per_player: int = 10, flush_interval: float = 5):
+        self.store = store
+        self.duration = duration
+        self.fee_rate = fee_rate
+        self.max_listings_per_player = max_listings_per_player
+        self.flush_interval = flush_interval
+        self.enabled = False
+        self._listings: Dict[int, Listing] = {}
+        self._books: Dict[str, OrderBook] = {}
+        self._by_seller: Dict[str, set] = {}
+        self._claims: Dict[str, List[Claim]] = {}
+        self._expiry: List[Tuple[float, int]] = []
+        self._next_id = 1
+        self._pending: List[Statement] = []
+        self._write_lock = asyncio.Lock()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self.characters: Optional[CharacterCache] = None
+
+    def configure(self, enabled: Optional[bool] = None, duration: Optional[float] = None,
+                  fee_rate: Optional[float] = None, max_listings_per_player: Optional[int] = None):
+        if enabled is not None:
+            self.enabled = enabled
+        if duration is not None:
+            self.duration = duration
+        if fee_rate is not None:
+            self.fee_rate = fee_rate
+        if max_listings_per_player is not None:
+            self.max_listings_per_player = max_listings_per_player
+
+    def _clear(self):
+        self._listings.clear()
+        self._books.clear()
+        self._by_seller.clear()
+        self._claims.clear()
+        self._expiry.clear()
+        self._next_id = 1
+
+    async def _create_tables(self):
+        await self.store.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS auction_listings (
+                listing_id INTEGER PRIMARY KEY,
+                seller_id TEXT NOT NULL,
+                seller_name TEXT NOT NULL,
+                item_name TEXT NOT NULL,
+                quantity INTEGER NOT NULL,
+                price INTEGER NOT NULL,
+                expires_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS auction_claims (
+                user_id TEXT NOT NULL,
+                item_name TEXT NOT NULL,
+                quantity INTEGER NOT NULL,
+                spirit_stones INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_auction_claims_user ON auction_claims (user_id);
+            """
+        )
+        # 物品详情列是后来加的，旧库补上；旧记录为空，领取时按 ITEMS 配置还原
+        item_columns = {"item_type": "TEXT NOT NULL DEFAULT ''", "description": "TEXT NOT NULL DEFAULT ''", "effect": "TEXT"}
+        await self.store.add_missing_columns("auction_listings", item_columns)
+        await self.store.add_missing_columns("auction_claims", item_columns)
+
+    async def load(self):
+        # 重复启动（插件重载）时从数据库完整重建，避免挂单与待领取记录重复
+        self._clear()
+        await self._create_tables()
+        for *row, effect in await self.store.fetchall(
+            "SELECT listing_id, seller_id, seller_name, item_name, quantity, price, expires_at, "
+            "item_type, description, effect FROM auction_listings"
+        ):
+            self._index(Listing(*row, _load_effect(effect)))
+        for user_id, *row, effect in await self.store.fetchall(
+            "SELECT user_id, item_name, quantity, spirit_stones, item_type, description, effect FROM auction_claims"
+        ):
+            self._claims.setdefault(user_id, []).append(Claim(*row, _load_effect(effect)))
+
+    # --- 内存索引 ---
+
+    def _index(self, listing: Listing):
+        self._listings[listing.listing_id] = listing
+        self._books.setdefault(listing.item_name, OrderBook()).add(listing)
+        self._by_seller.setdefault(listing.seller_id, set()).add(listing.listing_id)
+        heapq.heappush(self._expiry, (listing.expires_at, listing.listing_id))
+        self._next_id = max(self._next_id, listing.listing_id + 1)
+
+    def _unindex(self, listing: Listing):
+        # 过期堆采用惰性删除：弹出时发现编号已不在挂单中直接跳过
+        del self._listings[listing.listing_id]
+        book = self._books[listing.item_name]
+        book.remove(listing)
+        if not book:
+            del self._books[listing.item_name]
+        seller_listings = self._by_seller[listing.seller_id]
+        seller_listings.discard(listing.listing_id)
+        if not seller_listings:
+            del self._by_seller[listing.seller_id]
+
+    @staticmethod
+    def _insert_listing_row(listing: Listing) -> Statement:
+        return (
+            "INSERT INTO auction_listings (listing_id, seller_id, seller_name, item_name, quantity, price, expires_at, "
+            "item_type, description, effect) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            listing.row(),
+        )
+
+    @staticmethod
+    def _delete_listing_row(listing: Listing) -> Statement:
+        return ("DELETE FROM auction_listings WHERE listing_id = ?", (listing.listing_id,))
+
+    @staticmethod
+    def _insert_claim_row(user_id: str, claim: Claim) -> Statement:
+        return (
+            "INSERT INTO auction_claims (user_id, item_name, quantity, spirit_stones, item_type, description, effect) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (user_id, claim.item_name, claim.quantity, claim.spirit_stones,
+             claim.item_type, claim.description, _dump_effect(claim.effect)),
+        )
+
+    async def _commit(self, statements: List[Statement]):
+        """把排队的改动连同本次交易的记录在一个事务中立即写入，失败时抛出异常"""
+        async with self._write_lock:
+            pending, self._pending = self._pending, []
+            try:
+                await self.store.transaction(pending + statements)
+            except Exception:
+                self._pending = pending + self._pending
+                raise
+
+    async def _persist(self, character: Character):
+        """挂单与待领取记录提交后，立即把改动过的角色写入角色库，不等缓存定时落盘"""
+        if self.characters is None:
+            return
+        try:
+            await self.characters.write_through(character)
+        except Exception as e:
+            # 缓存中仍是脏数据，会在下次定时落盘时重试
+            logger.error(f"拍卖行结算后写入角色 {character.user_id} 失败: {e}")
+
+    @staticmethod
+    def _item_details(character: Character, item_name: str) -> Tuple[str, str, Any]:
+        """储物袋中该物品的 (类型, 描述, 效果)"""
+        for item in character.inventory:
+            if item.name == item_name:
+                return getattr(item, "item_type", ""), getattr(item, "description", ""), getattr(item, "effect", None)
+        item_info = ITEMS.get(item_name, {})
+        return item_info.get("type", "道具"), item_info.get("description", ""), item_info.get("effect")
+
+    @staticmethod
+    def _give_item(character: Character, item_name: str, quantity: int,
+                   item_type: str = "", description: str = "", effect: Any = None):
+        if not item_type:
+            # 旧记录没有保存物品详情，按 ITEMS 配置还原
+            item_info = ITEMS.get(item_name, {})
+            item_type = item_info.get("type", "道具")
+            description = item_info.get("description", "")
+            effect = item_info.get("effect")
+        character.add_item(
+            item_name=item_name,
+            quantity=quantity,
+            item_type=item_type,
+            description=description,
+            effect=effect
+        )
+
+    # --- 查询 ---
+
+    def get(self, listing_id: int) -> Optional[Listing]:
+        return self._listings.get(listing_id)
+
+    def cheapest(self, item_name: str, n: int = 10) -> List[Listing]:
+        book = self._books.get(item_name)
+        if not book:
+            return []
+        return [self._listings[listing_id] for listing_id in book.cheapest(n)]
+
+    def overview(self, n: int = 20) -> List[Tuple[str, int, int]]:
+        """各物品的 (名称, 挂单数, 最低价)，按挂单数从多到少"""
+        summary = [(name, len(book), book.entries[0][0]) for name, book in self._books.items()]
+        summary.sort(key=lambda entry: -entry[1])
+        return summary[:n]
+
+    def listings_of(self, seller_id: str) -> List[Listing]:
+        return sorted((self._listings[i] for i in self._by_seller.get(seller_id, ())), key=lambda l: l.listing_id)
+
+    def claims_of(self, user_id: str) -> List[Claim]:
+        return list(self._claims.get(user_id, ()))
+
+    # --- 交易 ---
+
+    async def create_listing(self, user_id: str, character: Character, item_name: str, quantity: int, price: int) -> Dict[str, object]:
+        if quantity <= 0 or price <= 0:
+            return {"success": False, "message": "数量和价格都必须大于0。"}
+        if len(self._by_seller.get(user_id, ())) >= self.max_listings_per_player:
+            return {"success": False, "message": f"你最多同时上架 {self.max_listings_per_player} 件拍品。"}
+        if not character.has_item(item_name, quantity):
+            return {"success": False, "message": f"你的储物袋中没有足够的“{item_name}”。"}
+
+        item_type, description, effect = self._item_details(character, item_name)
+        if consume(character, {item_name: quantity}):
+            return {"success": False, "message": f"你的储物袋中没有足够的“{item_name}”。"}
+        listing = Listing(self._next_id, user_id, character.name, item_name,
+                          quantity, price, time.time() + self.duration, item_type, description, effect)
+        # 先占用编号并建立索引，写库期间的其他上架不会拿到同一编号
+        self._index(listing)
+        try:
+            await self._commit([self._insert_listing_row(listing)])
+        except Exception as e:
+            logger.error(f"拍卖行上架写入失败: {e}")
+            self._unindex(listing)
+            self._give_item(character, item_name, quantity, item_type, description, effect)
+            return {"success": False, "message": "拍卖行账册写入失败，请稍后再试。"}
+        await self._persist(character)
+        if self._expiry[0][1] == listing.listing_id and self._wakeup:
+            self._wakeup.set()
+        return {
+            "success": True,
+            "message": f"上架成功！【{listing.listing_id}】{item_name} x{quantity}，售价 {price} 灵石。",
+        }
+
+    async def buy(self, user_id: str, character: Character, listing_id: int) -> Dict[str, object]:
+        listing = self._listings.get(listing_id)
+        if listing is None:
+            return {"success": False, "message": f"拍品【{listing_id}】不存在或已售出。"}
+        if listing.seller_id == user_id:
+            return {"success": False, "message": "不能购买自己上架的拍品，下架请使用 /拍卖行 下架 [编号]。"}
+        if character.spirit_stones < listing.price:
+            return {"success": False, "message": f"灵石不足，购买【{listing_id}】需要 {listing.price} 灵石。"}
+
+        # 检查与撤下挂单之间没有 await，同一拍品不会被两人同时买走
+        self._unindex(listing)
+        proceeds = listing.price - int(listing.price * self.fee_rate)
+        claim = Claim("", 0, proceeds)
+        try:
+            await self._commit([self._delete_listing_row(listing), self._insert_claim_row(listing.seller_id, claim)])
+        except Exception as e:
+            logger.error(f"拍卖行成交写入失败: {e}")
+            self._index(listing)
+            return {"success": False, "message": "拍卖行账册写入失败，请稍后再试。"}
+        # 成交记录已落库，再改动买卖双方
+        self._claims.setdefault(listing.seller_id, []).append(claim)
+        character.spirit_stones -= listing.price
+        self._give_item(character, listing.item_name, listing.quantity,
+                        listing.item_type, listing.description, listing.effect)
+        await self._persist(character)
+        return {
+            "success": True,
+            "message": f"购买成功！花费 {listing.price} 灵石从 {listing.seller_name} 处购得 {listing.item_name} x{listing.quantity}。",
+        }
+
+    async def buy_cheapest(self, user_id: str, character: Character, item_name: str) -> Dict[str, object]:
+        book = self._books.get(item_name)
+        if not book:
+            return {"success": False, "message": f"拍卖行中暂无“{item_name}”。"}
+        # 按价格从低到高跳过自己的挂单，最多跳过 max_listings_per_player 件
+        for listing_id in book:
+            if self._listings[listing_id].seller_id != user_id:
+                return await self.buy(user_id, character, listing_id)
+        return {"success": False, "message": f"拍卖行中暂无他人出售的“{item_name}”。"}
+
+    async def cancel(self, user_id: str, character: Character, listing_id: int) -> Dict[str, object]:
+        listing = self._listings.get(listing_id)
+        if listing is None or listing.seller_id != user_id:
+            return {"success": False, "message": f"你没有编号为【{listing_id}】的拍品。"}
+        self._unindex(listing)
+        try:
+            await self._commit([self._delete_listing_row(listing)])
+        except Exception as e:
+            logger.error(f"拍卖行下架写入失败: {e}")
+            self._index(listing)
+            return {"success": False, "message": "拍卖行账册写入失败，请稍后再试。"}
+        self._give_item(character, listing.item_name, listing.quantity,
+                        listing.item_type, listing.description, listing.effect)
+        await self._persist(character)
+        return {"success": True, "message": f"已下架【{listing_id}】，{listing.item_name} x{listing.quantity} 已放回储物袋。"}
+
+    async def collect(self, user_id: str, character: Character) -> Dict[str, object]:
+        claims = self._claims.pop(user_id, None)
+        if not claims:
+            return {"success": False, "message": "你没有待领取的物品或灵石。"}
+        try:
+            await self._commit([("DELETE FROM auction_claims WHERE user_id = ?", (user_id,))])
+        except Exception as e:
+            logger.error(f"拍卖行领取写入失败: {e}")
+            self._claims[user_id] = claims + self._claims.get(user_id, [])
+            return {"success": False, "message": "拍卖行账册写入失败，请稍后再试。"}
+        spirit_stones = 0
+        items: Dict[str, Claim] = {}
+        for claim in claims:
+            spirit_stones += claim.spirit_stones
+            if claim.item_name:
+                merged = items.get(claim.item_name)
+                items[claim.item_name] = claim if merged is None else merged._replace(quantity=merged.quantity + claim.quantity)
+        character.spirit_stones += spirit_stones
+        for claim in items.values():
+            self._give_item(character, claim.item_name, claim.quantity, claim.item_type, claim.description, claim.effect)
+        await self._persist(character)
+
+        parts = [f"{spirit_stones} 灵石"] if spirit_stones else []
+        parts.extend(f"{name} x{claim.quantity}" for name, claim in items.items())
+        return {"success": True, "message": f"领取成功！获得：{', '.join(parts)}。"}
+
+    # --- 后台调度 ---
+
+    def expire_due(self, now: Optional[float] = None) -> int:
+        """处理所有已到期的挂单，物品退回卖家待领取"""
+        now = now or time.time()
+        expired = 0
+        while self._expiry and self._expiry[0][0] <= now:
+            _, listing_id = heapq.heappop(self._expiry)
+            listing = self._listings.get(listing_id)
+            if listing is None:
+                continue
+            self._unindex(listing)
+            claim = Claim(listing.item_name, listing.quantity, 0,
+                          listing.item_type, listing.description, listing.effect)
+            self._claims.setdefault(listing.seller_id, []).append(claim)
+            self._pending.append(self._delete_listing_row(listing))
+            self._pending.append(self._insert_claim_row(listing.seller_id, claim))
+            expired += 1
+        return expired
+
+    async def flush(self):
+        """把排队的改动在一个事务中写入数据库"""
+        if not self._pending:
+            return
+        try:
+            await self._commit([])
+        except Exception as e:
+            logger.error(f"拍卖行数据写入失败: {e}")
+
+    async def _run(self):
+        while True:
+            delay = self.flush_interval
+            if self._expiry:
+                delay = max(0.0, min(delay, self._expiry[0][0] - time.time()))
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+            self.expire_due()
+            await self.flush()
+
+    async def start(self, characters: Optional[CharacterCache] = None):
+        if characters is not None:
+            self.characters = characters
+        await self.load()
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def reset(self):
+        """清空全部挂单与待领取记录（重置数据时使用），未启用拍卖行时也会清理旧数据"""
+        async with self._write_lock:
+            self._clear()
+            self._pending = []
+            await self._create_tables()
+            await self.store.transaction([("DELETE FROM auction_listings", ()), ("DELETE FROM auction_claims", ())])
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+
+# 全局共享的拍卖行
+auction_house = AuctionHouse(side_store)
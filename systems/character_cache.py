@@ -0,0 +1,178 @@
+# astrbot_plugin_cultivation/systems/character_cache.py
+
+import asyncio
+import pickle
+from collections import OrderedDict
+from typing import Callable, Dict, Any, Optional
+from astrbot.api import logger
+from ..models.character import Character
+from ..database.db_manager import DatabaseManager
+
+
+class _CacheEntry:
+    """缓存条目：角色对象 + 上次落盘时的序列化指纹 + 脏标记"""
+
+    __slots__ = ("character", "fingerprint", "dirty")
+
+    def __init__(self, character: Character, fingerprint: Optional[bytes]):
+        self.character = character
+        self.fingerprint = fingerprint
+        self.dirty = False
+
+
+class CharacterCache:
+    """
+    角色写回缓存，放在 DatabaseManager 之前。
+    - 以 sender_id 为键，LRU 淘汰
+    - save_character 只做脏标记，不直接写库
+    - 定时 / 卸载时统一落盘；落盘前与上次落盘时的序列化指纹比对，实际未改动的角色不会产生写入
+    - 数据库只支持整行保存，因此落盘写的是整个角色
+    - 可选的 accrual(user_id, character) 在每次读取时结算离线收益，返回 True 时该角色记为脏
+    - 可选的 on_save(character) 在每次 save_character 时调用（如更新排行榜索引）
+    对外暴露与 DatabaseManager 相同的接口，可直接替换各系统中的 db_manager。
+    """
+
+    def __init__(self, db_manager: DatabaseManager, max_size: int = 1000, flush_interval: float = 5.0,
+                 accrual: Optional[Callable[[str, Character], bool]] = None,
+                 on_save: Optional[Callable[[Character], None]] = None):
+        self.db_manager = db_manager
+        self.accrual = accrual
+        self.on_save = on_save
+        self.max_size = max(1, max_size)
+        self.flush_interval = flush_interval
+        self._entries: "OrderedDict[str, _CacheEntry]" = OrderedDict()
+        self._evicted: Dict[str, _CacheEntry] = {}  # 已被淘汰但尚未落盘的脏条目
+        self._flush_task: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.misses = 0
+
+    def __getattr__(self, name: str):
+        # 其余数据库接口（init_database、close 等）直接透传
+        return getattr(self.db_manager, name)
+
+    @staticmethod
+    def _fingerprint(character: Character) -> bytes:
+        """角色的序列化指纹，用于判断落盘前是否真的有改动"""
+        return pickle.dumps(character, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def _touch(self, user_id: str, entry: _CacheEntry):
+        self._entries[user_id] = entry
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_size:
+            old_id, old_entry = self._entries.popitem(last=False)
+            if old_entry.dirty:
+                self._evicted[old_id] = old_entry
+
+    async def get_character(self, user_id: str) -> Optional[Character]:
+        """获取角色，命中时直接返回内存中的对象"""
+        entry = self._entries.get(user_id) or self._evicted.pop(user_id, None)
+        if entry:
+            self.hits += 1
+            self._touch(user_id, entry)
+            return await self._accrue(user_id, entry.character)
+
+        self.misses += 1
+        character = await self.db_manager.get_character(user_id)
+        if character is None:
+            return None
+        # 并发未命中时以先入缓存的对象为准，避免同一角色出现两份副本
+        entry = self._entries.get(user_id)
+        if entry:
+            return await self._accrue(user_id, entry.character)
+        self._touch(user_id, _CacheEntry(character, self._fingerprint(character)))
+        return await self._accrue(user_id, character)
+
+    async def _accrue(self, user_id: str, character: Character) -> Character:
+        if self.accrual is not None and self.accrual(user_id, character):
+            await self.save_character(character)
+        return character
+
+    async def save_character(self, character: Character):
+        """标记为脏，延迟写入"""
+        user_id = character.user_id
+        entry = self._entries.get(user_id)
+        if entry is None or entry.character is not character:
+            # 缓存外的新对象（如新建角色）：没有指纹，落盘时必定写入
+            entry = _CacheEntry(character, None)
+            self._touch(user_id, entry)
+        entry.dirty = True
+        if self.on_save is not None:
+            self.on_save(character)
+
+    async def flush(self) -> int:
+        """将所有脏角色写入数据库，返回写入的角色数量"""
+        pending = dict(self._evicted)
+        self._evicted.clear()
+        for user_id, entry in self._entries.items():
+            if entry.dirty:
+                pending[user_id] = entry
+
+        written = 0
+        for user_id, entry in pending.items():
+            entry.dirty = False
+            fingerprint = self._fingerprint(entry.character)
+            if fingerprint == entry.fingerprint:
+                continue
+            try:
+                await self.db_manager.save_character(entry.character)
+                entry.fingerprint = fingerprint
+                written += 1
+            except Exception as e:
+                logger.error(f"角色 {user_id} 写回失败: {e}")
+                entry.dirty = True
+                if user_id not in self._entries:
+                    self._evicted[user_id] = entry
+        return written
+
+    async def write_through(self, character: Character):
+        """立即把单个角色写入下层（写入队列会随之提交），用于不能只停留在缓存中的结算；失败时保留脏标记并抛出异常"""
+        await self.save_character(character)
+        entry = self._entries[character.user_id]
+        entry.dirty = False
+        fingerprint = self._fingerprint(character)
+        try:
+            await self.db_manager.save_character(character)
+            commit = getattr(self.db_manager, "flush", None)
+            if commit is not None:
+                await commit()
+        except Exception:
+            entry.dirty = True
+            raise
+        entry.fingerprint = fingerprint
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"角色缓存定时写回失败: {e}")
+
+    def start(self):
+        """启动定时写回任务"""
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        """停止定时任务并写回全部脏数据"""
+        if self._flush_task:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        await self.flush()
+
+    async def reset_all_data(self):
+        self._entries.clear()
+        self._evicted.clear()
+        await self.db_manager.reset_all_data()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "size": len(self._entries),
+            "pending_evicted": len(self._evicted),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
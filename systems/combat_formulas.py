@@ -0,0 +1,50 @@
+# astrbot_plugin_cultivation/systems/combat_formulas.py
+"""
+战斗公式。
+CombatSystem 与离线平衡模拟器 (combat_simulator) 共用这里的纯函数，保证两边结算一致。
+"""
+
+# 伤害随机波动范围
+DAMAGE_VARIATION = (0.8, 1.2)
+# 每点速度提供的闪避率 / 逃跑成功率
+DODGE_PER_SPEED = 0.005
+FLEE_PER_SPEED = 0.01
+# 每级等级差提供的逃跑成功率
+FLEE_PER_LEVEL = 0.05
+FLEE_RATE_RANGE = (0.1, 0.95)
+
+
+def base_damage(attack: int, defense: int) -> int:
+    """防御减免后的基础伤害，至少为1"""
+    return max(1, attack - defense // 2)
+
+
+def player_damage(attack: int, monster_defense: int, variation: float,
+                  is_critical: bool, crit_damage: float) -> int:
+    """玩家对怪物造成的伤害"""
+    damage = int(base_damage(attack, monster_defense) * variation)
+    if is_critical:
+        damage = int(damage * crit_damage)
+    return damage
+
+
+def monster_damage(monster_attack: int, player_defense: int, variation: float) -> int:
+    """怪物对玩家造成的伤害"""
+    return int(base_damage(monster_attack, player_defense) * variation)
+
+
+def dodge_rate(base_dodge_rate: float, speed: int) -> float:
+    return base_dodge_rate + speed * DODGE_PER_SPEED
+
+
+def flee_rate(base_flee_rate: float, player_level: int, monster_level: int, speed: int) -> float:
+    rate = base_flee_rate + (player_level - monster_level) * FLEE_PER_LEVEL + speed * FLEE_PER_SPEED
+    return max(FLEE_RATE_RANGE[0], min(FLEE_RATE_RANGE[1], rate))
+
+
+def kill_exp_reward(exp_reward: int, player_level: int, monster_level: int) -> int:
+    """击杀经验，等级差超过5级时递减"""
+    level_diff = player_level - monster_level
+    if level_diff > 5:
+        return max(1, exp_reward // (level_diff - 4))
+    return exp_reward
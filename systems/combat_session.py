@@ -0,0 +1,188 @@
+# astrbot_plugin_cultivation/systems/combat_session.py
+
+import json
+import time
+from typing import Dict, Any, Optional, Tuple
+from ..models.character import Character, Monster
+from .generators import MonsterGenerator
+
+
+class CombatSession:
+    """单场战斗的内存状态，使用 __slots__ 保持紧凑"""
+
+    __slots__ = (
+        "user_id", "monster_id", "monster_name", "monster_level",
+        "monster_hp", "monster_max_hp", "monster_attack", "monster_defense",
+        "exp_reward", "spirit_stones_reward", "loot",
+        "turn", "round", "expires_at",
+    )
+
+    def __init__(self, user_id: str, monster_id: str, monster_name: str, monster_level: int,
+                 monster_hp: int, monster_max_hp: int, monster_attack: int, monster_defense: int,
+                 exp_reward: int = 0, spirit_stones_reward: int = 0, loot: Tuple[Tuple[str, int], ...] = (),
+                 turn: str = "player", round: int = 1, expires_at: float = 0.0):
+        self.user_id = user_id
+        self.monster_id = monster_id
+        self.monster_name = monster_name
+        self.monster_level = monster_level
+        self.monster_hp = monster_hp
+        self.monster_max_hp = monster_max_hp
+        self.monster_attack = monster_attack
+        self.monster_defense = monster_defense
+        # 奖励在开战时一次性结算，击杀时直接发放
+        self.exp_reward = exp_reward
+        self.spirit_stones_reward = spirit_stones_reward
+        self.loot = loot
+        self.turn = turn
+        self.round = round
+        self.expires_at = expires_at
+
+    @classmethod
+    def from_monster(cls, user_id: str, monster: Monster, expires_at: float) -> "CombatSession":
+        return cls(
+            user_id=user_id,
+            monster_id=monster.id,
+            monster_name=monster.name,
+            monster_level=monster.level,
+            monster_hp=monster.hp,
+            monster_max_hp=monster.max_hp,
+            monster_attack=monster.attack,
+            monster_defense=monster.defense,
+            exp_reward=monster.exp_reward,
+            spirit_stones_reward=monster.spirit_stones_reward,
+            loot=tuple((item["name"], item["quantity"]) for item in monster.drop_items),
+            expires_at=expires_at,
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        # 键名与旧版 combat_state 保持一致
+        return {name: getattr(self, name) for name in self.__slots__ if name != "user_id"}
+
+    @classmethod
+    def from_dict(cls, user_id: str, data: Dict[str, Any]) -> "CombatSession":
+        return cls(
+            user_id=user_id,
+            monster_id=data["monster_id"],
+            monster_name=data["monster_name"],
+            monster_level=data.get("monster_level", 1),
+            monster_hp=data["monster_hp"],
+            monster_max_hp=data["monster_max_hp"],
+            monster_attack=data["monster_attack"],
+            monster_defense=data["monster_defense"],
+            exp_reward=data.get("exp_reward", 0),
+            spirit_stones_reward=data.get("spirit_stones_reward", 0),
+            loot=tuple((name, quantity) for name, quantity in data.get("loot", [])),
+            turn=data.get("turn", "player"),
+            round=data.get("round", 1),
+            expires_at=data.get("expires_at", 0.0),
+        )
+
+    def is_expired(self, now: Optional[float] = None) -> bool:
+        return bool(self.expires_at) and (now or time.time()) >= self.expires_at
+
+
+class CombatSessionStore:
+    """
+    战斗会话存储。
+    - 战斗回合只修改内存中的会话，不做 JSON 序列化，也不写库
+    - 仅在开战、每隔 checkpoint_rounds 回合以及战斗结束时写回 character.combat_state
+    - 会话超过 ttl 秒无操作即过期；同时进行的战斗数受 max_sessions 限制
+    """
+
+    def __init__(self, ttl: float = 600, max_sessions: int = 100, checkpoint_rounds: int = 5):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.checkpoint_rounds = checkpoint_rounds
+        self._sessions: Dict[str, CombatSession] = {}
+
+    def configure(self, ttl: Optional[float] = None, max_sessions: Optional[int] = None,
+                  checkpoint_rounds: Optional[int] = None):
+        if ttl is not None:
+            self.ttl = ttl
+        if max_sessions is not None:
+            self.max_sessions = max_sessions
+        if checkpoint_rounds is not None:
+            self.checkpoint_rounds = checkpoint_rounds
+
+    def _purge_expired(self):
+        now = time.time()
+        for user_id in [uid for uid, s in self._sessions.items() if s.is_expired(now)]:
+            del self._sessions[user_id]
+
+    def get(self, user_id: str) -> Optional[CombatSession]:
+        session = self._sessions.get(user_id)
+        if session is None:
+            return None
+        if session.is_expired():
+            del self._sessions[user_id]
+            return None
+        session.expires_at = time.time() + self.ttl
+        return session
+
+    def active(self, user_id: str) -> bool:
+        """是否有未过期的会话，不刷新过期时间"""
+        session = self._sessions.get(user_id)
+        return session is not None and not session.is_expired()
+
+    def has_room(self, user_id: str) -> bool:
+        """该玩家能否再占用一个会话（已有会话或未达到同时战斗上限）"""
+        if user_id in self._sessions or len(self._sessions) < self.max_sessions:
+            return True
+        self._purge_expired()
+        return len(self._sessions) < self.max_sessions
+
+    def create(self, user_id: str, monster: Monster) -> Optional[CombatSession]:
+        """创建会话，已达到同时战斗上限时返回 None"""
+        if not self.has_room(user_id):
+            return None
+        session = CombatSession.from_monster(user_id, monster, time.time() + self.ttl)
+        self._sessions[user_id] = session
+        return session
+
+    def restore(self, character: Character) -> Optional[CombatSession]:
+        """从角色的检查点恢复会话（例如插件重启后），与 create 同样受同时战斗上限限制"""
+        if not character.combat_state or not self.has_room(character.user_id):
+            return None
+        try:
+            data = json.loads(character.combat_state)
+            if "exp_reward" not in data:
+                self._fill_rewards(character, data)
+            session = CombatSession.from_dict(character.user_id, data)
+        except (ValueError, KeyError, TypeError):
+            return None
+        if session.is_expired():
+            return None
+        session.expires_at = time.time() + self.ttl
+        self._sessions[character.user_id] = session
+        return session
+
+    @staticmethod
+    def _fill_rewards(character: Character, data: Dict[str, Any]):
+        """旧版检查点没有奖励字段：与旧版击杀结算相同，按怪物模板和角色等级生成一次奖励"""
+        monster = MonsterGenerator.create_monster(data["monster_id"], character.level)
+        if monster is None:
+            return
+        data["exp_reward"] = monster.exp_reward
+        data["spirit_stones_reward"] = monster.spirit_stones_reward
+        data["loot"] = [(item["name"], item["quantity"]) for item in monster.drop_items]
+
+    def end(self, user_id: str):
+        self._sessions.pop(user_id, None)
+
+    def reset(self):
+        """丢弃全部会话（重置数据时使用）"""
+        self._sessions.clear()
+
+    def checkpoint(self, character: Character, session: CombatSession, force: bool = False) -> bool:
+        """按回合间隔把会话写回 character.combat_state，返回是否写入"""
+        if not force and (self.checkpoint_rounds <= 0 or session.round % self.checkpoint_rounds):
+            return False
+        character.combat_state = json.dumps(session.to_dict())
+        return True
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+
+# 全局共享的战斗会话存储，探索系统与指令处理使用同一份
+combat_sessions = CombatSessionStore()
@@ -0,0 +1,149 @@
+# astrbot_plugin_cultivation/systems/combat_simulator.py
+"""
+离线战斗平衡模拟器。
+基于 combat_formulas 中与 CombatSystem 相同的公式，用 NumPy 一次性批量模拟大量战斗，
+输出 (玩家等级, 怪物模板) 网格上的胜率、期望回合数与每回合收益，用于调整
+COMBAT_SETTINGS 和标签倍率。需要额外安装 numpy，插件运行时不依赖本模块。
+"""
+
+from typing import Dict, Any, Iterable, List, NamedTuple, Optional
+from ..models.character import Character
+from ..utils.constants import COMBAT_SETTINGS
+from .generators import MonsterGenerator
+from . import combat_formulas as formulas
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - 仅离线工具需要
+    np = None
+
+
+class PlayerProfile(NamedTuple):
+    """模拟用的玩家属性快照"""
+    level: int
+    hp: int
+    attack: int
+    defense: int
+    speed: int
+    crit_rate: float
+    crit_damage: float
+
+    @classmethod
+    def from_character(cls, character: Character) -> "PlayerProfile":
+        stats = character.get_total_stats()
+        return cls(
+            level=character.level,
+            hp=character.stats.max_hp,
+            attack=stats["attack"],
+            defense=stats["defense"],
+            speed=stats["speed"],
+            crit_rate=stats["crit_rate"],
+            crit_damage=stats["crit_damage"],
+        )
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("战斗模拟器需要 numpy，请先执行 pip install numpy")
+
+
+def simulate_fights(player: PlayerProfile, template_id: str, fights: int = 100000,
+                    max_rounds: int = 100, seed: Optional[int] = None,
+                    settings: Optional[Dict[str, float]] = None) -> Optional[Dict[str, Any]]:
+    """
+    批量模拟同一玩家对同一怪物模板的 fights 场战斗（玩家每回合都选择攻击）。
+    返回胜率、败率、超时率、期望回合数和每回合收益；模板不存在时返回 None。
+    """
+    _require_numpy()
+    monster = MonsterGenerator.compile_template(template_id, player.level)
+    if not monster:
+        return None
+
+    settings = settings or COMBAT_SETTINGS
+    rng = np.random.default_rng(seed)
+    low, high = formulas.DAMAGE_VARIATION
+
+    player_hp = np.full(fights, player.hp, dtype=np.int64)
+    monster_hp = np.full(fights, monster.hp, dtype=np.int64)
+    rounds = np.zeros(fights, dtype=np.int64)
+    won = np.zeros(fights, dtype=bool)
+    lost = np.zeros(fights, dtype=bool)
+    active = np.ones(fights, dtype=bool)
+
+    player_base = formulas.base_damage(player.attack, monster.defense)
+    monster_base = formulas.base_damage(monster.attack, player.defense)
+    dodge = formulas.dodge_rate(settings["base_dodge_rate"], player.speed)
+
+    for _ in range(max_rounds):
+        count = int(active.sum())
+        if not count:
+            break
+        idx = np.flatnonzero(active)
+        rounds[idx] += 1
+
+        # 玩家攻击：int(基础伤害 * 波动)，暴击时再乘暴击伤害并取整
+        damage = (player_base * rng.uniform(low, high, count)).astype(np.int64)
+        critical = rng.random(count) < player.crit_rate
+        damage[critical] = (damage[critical] * player.crit_damage).astype(np.int64)
+        monster_hp[idx] -= damage
+
+        killed = monster_hp[idx] <= 0
+        won[idx[killed]] = True
+        idx = idx[~killed]
+
+        # 怪物反击：先判定闪避，再计算波动伤害
+        hit = rng.random(idx.size) >= dodge
+        hit_idx = idx[hit]
+        player_hp[hit_idx] -= (monster_base * rng.uniform(low, high, hit_idx.size)).astype(np.int64)
+        lost[hit_idx[player_hp[hit_idx] <= 0]] = True
+
+        active = ~(won | lost)
+
+    exp_reward = formulas.kill_exp_reward(monster.exp, player.level, monster.level)
+    win_rate = float(won.mean())
+    expected_rounds = float(rounds.mean())
+    won_rounds = float(rounds[won].mean()) if win_rate else 0.0
+
+    return {
+        "level": player.level,
+        "template_id": template_id,
+        "monster": monster.name,
+        "fights": fights,
+        "win_rate": win_rate,
+        "loss_rate": float(lost.mean()),
+        "timeout_rate": float(active.mean()),
+        "expected_rounds": expected_rounds,
+        "rounds_to_win": won_rounds,
+        "exp_per_round": exp_reward * win_rate / expected_rounds if expected_rounds else 0.0,
+        "spirit_stones_per_round": monster.spirit_stones * win_rate / expected_rounds if expected_rounds else 0.0,
+        "flee_rate": formulas.flee_rate(settings["base_flee_rate"], player.level, monster.level, player.speed),
+    }
+
+
+def simulate_grid(players: Iterable[PlayerProfile], template_ids: Iterable[str], fights: int = 100000,
+                  max_rounds: int = 100, seed: Optional[int] = None,
+                  settings: Optional[Dict[str, float]] = None) -> List[Dict[str, Any]]:
+    """对 (玩家等级, 怪物模板) 网格逐格模拟，返回结果行列表"""
+    template_ids = list(template_ids)
+    rng = np.random.default_rng(seed) if np is not None else None
+    results = []
+    for player in players:
+        for template_id in template_ids:
+            cell_seed = int(rng.integers(2 ** 32)) if rng is not None else None
+            row = simulate_fights(player, template_id, fights, max_rounds, cell_seed, settings)
+            if row:
+                results.append(row)
+    return results
+
+
+def format_report(rows: List[Dict[str, Any]]) -> str:
+    """将模拟结果格式化为纯文本表格"""
+    header = f"{'等级':>4} {'怪物':<16} {'胜率':>7} {'败率':>7} {'期望回合':>8} {'经验/回合':>9} {'灵石/回合':>9} {'逃跑率':>7}"
+    lines = [header, "-" * len(header)]
+    for row in rows:
+        lines.append(
+            f"{row['level']:>4} {row['monster']:<16} {row['win_rate']:>7.1%} {row['loss_rate']:>7.1%} "
+            f"{row['expected_rounds']:>8.2f} {row['exp_per_round']:>9.2f} "
+            f"{row['spirit_stones_per_round']:>9.2f} {row['flee_rate']:>7.1%}"
+        )
+    return "\n".join(lines)
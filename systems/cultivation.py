@@ -54,7 +54,7 @@ class CultivationSystem:
         # --- ↓↓↓ 此處是核心修正 ↓↓↓ ---
         # 生成修炼描述 (使用通用的 generate_text 方法)
         llm_prompt = f"为名为 {character.name}（境界：{character.get_realm_display()}），灵根为{character.spirit_root}的修士，生成一段修炼感悟的描述。本次修炼获得了{exp_gained}点经验。"
-        cultivation_desc = await self.llm_utils.generate_text(llm_prompt, 80)
+        cultivation_desc = await self.llm_utils.generate_text(llm_prompt, 80, slots={"name": character.name})
         # --- ↑↑↑ 修正結束 ↑↑↑ ---
 
         # 构建返回消息
@@ -66,7 +66,8 @@ class CultivationSystem:
         if event_triggered:
             message += f"特殊事件：{event_message}\n\n"
 
-        message += f"{cultivation_desc}\n"
+        if cultivation_desc:
+            message += f"{cultivation_desc}\n"
 
         if level_up_messages:
             message += "\n" + "\n".join(level_up_messages)
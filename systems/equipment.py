@@ -100,9 +100,9 @@ class EquipmentSystem:
 
     async def _generate_equipment_description(self, equipment_name: str) -> str:
         """生成装备描述"""
-        description = await self.llm_utils.generate_text(f"为名为【{equipment_name}】的装备生成一段仙侠风格的描述。", 80)
+        description = await self.llm_utils.generate_text(f"为名为【{equipment_name}】的装备生成一段仙侠风格的描述。", 80, slots={"equipment": equipment_name})
 
-        if description in ["生成失败，请稍后重试", "LLM服务暂不可用"]:
+        if not description or description in ["生成失败，请稍后重试", "LLM服务暂不可用"]:
             description = f"一件看似不凡的{equipment_name}。"
 
         return description
@@ -140,7 +140,7 @@ class EquipmentSystem:
         character.equipment[equipment_type] = equipment
 
         equip_desc = await self.llm_utils.generate_text(
-            f"生成装备{equipment.name}的描述", 80
+            f"生成装备{equipment.name}的描述", 80, slots={"equipment": equipment.name}
         )
 
         message = f"装备成功！\n\n"
@@ -162,7 +162,7 @@ class EquipmentSystem:
         if old_equipment:
             message += f"\n替换了：{old_equipment.name}"
 
-        if equip_desc not in ["生成失败，请稍后重试", "LLM服务暂不可用"]:
+        if equip_desc and equip_desc not in ["生成失败，请稍后重试", "LLM服务暂不可用"]:
             message += f"\n\n{equip_desc}"
 
         return {
@@ -266,13 +266,15 @@ class EquipmentSystem:
             "message": message
         }
 
-    def calculate_equipment_power(self, character: Character) -> int:
+    @staticmethod
+    def calculate_equipment_power(character: Character) -> int:
         """计算装备总战力"""
         total_power = 0
         for equipment in character.equipment.values():
             if equipment:
-                power = (getattr(equipment, 'attack_bonus', 0) * 2 +
-                         getattr(equipment, 'defense_bonus', 0) +
+                # 字段名与 Equipment 模型一致（atk_buff / def_buff），排行榜按此战力排序
+                power = (getattr(equipment, 'atk_buff', 0) * 2 +
+                         getattr(equipment, 'def_buff', 0) +
                          getattr(equipment, 'hp_bonus', 0) // 10)
                 total_power += power
         return total_power
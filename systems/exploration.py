@@ -3,23 +3,75 @@
 import random
 import json
 import os
-from typing import Dict, Any
+from typing import Dict, Any, List, NamedTuple, Optional
+from astrbot.api import logger
 from ..models.character import Character, Equipment
 from ..database.db_manager import DatabaseManager
 from ..utils.llm_utils import LLMUtils
 from ..systems.combat import CombatSystem
 from ..utils.constants import LOCATIONS, MONSTERS, COMBAT_SETTINGS, RANDOM_EVENTS, EXPLORATION_SETTINGS, ALCHEMY_DATA
 from ..utils.path_utils import PLUGIN_DATA_DIR
+from .flavor_pool import flavor_pool
+from .reward_expr import RewardExpressionError, RewardFn, compile_fields
+from .sampling import AliasTable
+
+BASE_OUTCOME_WEIGHTS = {
+    "monster_encounter": 0.4, "treasure_found": 0.15, "special_event": 0.1,
+    "nothing": 0.15, "normal": 0.2, "boss_encounter": 0.02
+}
+# 气运按档位取预先算好的分布；超过上限的气运按上限计算
+LUCK_STEP = 5
+LUCK_CAP = 100
+
+REWARD_EXPRESSION_FIELDS = ("exp", "spirit_stones", "damage")
+# 各奖励类型结算时必须提供的表达式字段
+REQUIRED_REWARD_FIELDS = {
+    "exp": ("exp",),
+    "enlightenment": ("exp",),
+    "treasure": ("spirit_stones",),
+    "damage": ("damage",),
+}
+
+
+class CompiledEvent(NamedTuple):
+    event: Dict[str, Any]
+    rewards: Dict[str, RewardFn]  # 奖励字段 -> 编译后的表达式
 
 
 class ExplorationSystem:
     """探索系统"""
 
+    # 奇遇配置只在插件加载时读取一次，首次访问时编译
+    _events: Optional[List[CompiledEvent]] = None
+    _outcome_tables: Dict[tuple, AliasTable] = {}
+
     def __init__(self, db_manager: DatabaseManager, llm_utils: LLMUtils):
         self.db_manager = db_manager
         self.llm_utils = llm_utils
         self.combat_system = CombatSystem(db_manager, llm_utils)
         self.alchemy_data_path = os.path.join(PLUGIN_DATA_DIR, "alchemy.json")
+        # 加载时即编译奇遇奖励表达式，配置错误在启动日志中暴露
+        self.compiled_events()
+        # 预先构建所有气运档位的探索结果抽样表
+        for info in LOCATIONS.values():
+            for luck in range(0, LUCK_CAP + 1, LUCK_STEP):
+                self.outcome_table(luck, info)
+
+    @classmethod
+    def compiled_events(cls) -> List[CompiledEvent]:
+        if cls._events is None:
+            events = []
+            for event_id, event in RANDOM_EVENTS.get("exploration", {}).items():
+                try:
+                    reward = event["reward"]
+                    missing = [f for f in REQUIRED_REWARD_FIELDS.get(reward["type"], ()) if f not in reward]
+                    if missing:
+                        raise RewardExpressionError(f"缺少字段 {', '.join(missing)}")
+                    events.append(CompiledEvent(event, compile_fields(reward, REWARD_EXPRESSION_FIELDS)))
+                except (RewardExpressionError, KeyError) as e:
+                    logger.error(f"奇遇事件 {event_id} 的奖励配置无效，已忽略: {e}")
+            cls._events = events
+        return cls._events
 
     async def explore_area(self, character: Character) -> Dict[str, Any]:
         """探索当前区域"""
@@ -40,31 +92,39 @@ class ExplorationSystem:
         else:
             return await self._handle_normal_exploration(character, character.location)
 
+    @staticmethod
+    def _outcome_weights(luck: int, has_monsters: bool, has_bosses: bool) -> Dict[str, float]:
+        """某一气运档位、某类地点的探索结果权重（未归一化）"""
+        weights = dict(BASE_OUTCOME_WEIGHTS)
+        luck_modifier = luck * 0.01
+        weights["treasure_found"] += luck_modifier
+        weights["monster_encounter"] = max(0.0, weights["monster_encounter"] - luck_modifier * 0.5)
+
+        if not has_monsters:
+            weights["monster_encounter"] = 0
+            weights["normal"] += 0.4
+
+        if not has_bosses:
+            weights["boss_encounter"] = 0
+            weights["normal"] += 0.02
+        return weights
+
+    @classmethod
+    def outcome_table(cls, luck: int, location_info: Dict) -> AliasTable:
+        """
+        取预先算好的探索结果抽样表。
+        结果只取决于气运档位和地点是否有妖兽/首领，按这三者缓存，每个组合只构建一次。
+        """
+        bucket = max(0, min(int(luck), LUCK_CAP)) // LUCK_STEP
+        key = (bucket, bool(location_info.get("monsters")), bool(location_info.get("bosses")))
+        table = cls._outcome_tables.get(key)
+        if table is None:
+            table = cls._outcome_tables[key] = AliasTable(cls._outcome_weights(bucket * LUCK_STEP, key[1], key[2]))
+        return table
+
     def _determine_exploration_result(self, character: Character, location_info: Dict) -> str:
         """确定探索结果类型"""
-        probabilities = {
-            "monster_encounter": 0.4, "treasure_found": 0.15, "special_event": 0.1,
-            "nothing": 0.15, "normal": 0.2, "boss_encounter": 0.02
-        }
-        luck_modifier = character.stats.luck * 0.01
-        probabilities["treasure_found"] += luck_modifier
-        probabilities["monster_encounter"] -= luck_modifier * 0.5
-
-        if not location_info.get("monsters"):
-            probabilities["monster_encounter"] = 0
-            probabilities["normal"] += 0.4
-
-        if not location_info.get("bosses"):
-            probabilities["boss_encounter"] = 0
-            probabilities["normal"] += 0.02
-
-        rand = random.random()
-        cumulative = 0
-        for result_type, prob in probabilities.items():
-            cumulative += prob
-            if rand <= cumulative:
-                return result_type
-        return "normal"
+        return self.outcome_table(character.stats.luck, location_info).sample()
         
     async def _handle_boss_encounter(self, character: Character, location_info: Dict) -> Dict[str, Any]:
         """处理Boss遭遇"""
@@ -143,7 +203,7 @@ class ExplorationSystem:
         character.spirit_stones += spirit_stones_gain
         level_up_messages = character.level_up()
         
-        exploration_desc = await self.llm_utils.generate_exploration_description(location, "normal")
+        exploration_desc = flavor_pool.pop(location, "normal") or await self.llm_utils.generate_exploration_description(location, "normal")
         message = f"【探索{location}】\n\n{exploration_desc}\n\n获得经验：{exp_gain}点\n获得灵石：{spirit_stones_gain}枚"
         if level_up_messages:
             message += "\n\n" + "\n".join(level_up_messages)
@@ -157,7 +217,10 @@ class ExplorationSystem:
         
     async def _handle_special_event(self, character: Character, location_info: Dict) -> Dict[str, Any]:
         """处理特殊事件"""
-        event = random.choice(list(RANDOM_EVENTS["exploration"].values()))
+        events = self.compiled_events()
+        if not events:
+            return await self._handle_normal_exploration(character, character.location)
+        event, compiled = random.choice(events)
         
         event_desc_context = f"为在{character.location}探索时触发了【{event['name']}】事件的修士，生成一段富有仙侠小说风格的生动情景描述，要体现出事件特色。"
         event_description = await self.llm_utils.generate_text(event_desc_context, 100)
@@ -176,7 +239,7 @@ class ExplorationSystem:
         }
 
         if reward["type"] == "exp":
-            exp_gain = eval(reward["exp"])
+            exp_gain = compiled["exp"](character)
             character.exp += exp_gain
             reward_messages.append(f"获得经验: {exp_gain}点")
         elif reward["type"] == "restore":
@@ -186,7 +249,7 @@ class ExplorationSystem:
                 character.stats.qi = character.stats.max_qi
             reward_messages.append("你的状态已完全恢复！")
         elif reward["type"] == "treasure":
-            spirit_stones_gain = eval(reward["spirit_stones"])
+            spirit_stones_gain = compiled["spirit_stones"](character)
             character.spirit_stones += spirit_stones_gain
             reward_messages.append(f"获得灵石: {spirit_stones_gain}枚")
             for item in reward["items"]:
@@ -199,13 +262,13 @@ class ExplorationSystem:
                 character.add_item(item, 1)
                 reward_messages.append(f"获得物品: {item}")
         elif reward["type"] == "damage":
-            damage = eval(reward["damage"])
+            damage = compiled["damage"](character)
             character.stats.hp = max(1, character.stats.hp - damage)
             reward_messages.append(f"你受到了{damage}点伤害！")
         elif reward["type"] == "shop":
             reward_messages.append("你可以使用 /购买 指令与他们交易。")
         elif reward["type"] == "enlightenment":
-            exp_gain = eval(reward["exp"])
+            exp_gain = compiled["exp"](character)
             character.exp += exp_gain
             reward_messages.append(f"获得经验: {exp_gain}点")
             if reward.get("stats_boost"):
@@ -0,0 +1,161 @@
+# astrbot_plugin_cultivation/systems/flavor_pool.py
+
+import asyncio
+import json
+import os
+import random
+import time
+from collections import defaultdict, deque
+from typing import Deque, Dict, Iterable, Optional, Set, Tuple
+from astrbot.api import logger
+from ..utils.llm_utils import LLMUtils
+from ..utils.path_utils import PLUGIN_DATA_DIR
+from .llm_cache import LLM_FAILURE_TEXTS
+from .llm_scheduler import FALLBACKS, EXPLORATION_FALLBACKS
+
+PoolKey = Tuple[str, str]  # (地点/天劫, 事件类型)
+
+# LLM 失败或熔断时返回的提示与预设文案，不能当作预生成文案存入池中
+UNUSABLE_TEXTS = frozenset(LLM_FAILURE_TEXTS) | frozenset(
+    text for text in (*FALLBACKS.values(), *EXPLORATION_FALLBACKS.values()) if isinstance(text, str)
+)
+
+
+class FlavorTextPool:
+    """
+    预生成文案池。
+    为每个 (地点, 事件类型) 预先准备 pool_size 条文案（天劫名已对应目标境界，无需再按境界区分），探索、遇敌、渡劫时直接取用，零等待。
+    后台任务只在机器人空闲时补充，两次 LLM 调用之间至少间隔 cooldown 秒；池内容同时保存到磁盘，重启后可直接使用。
+    """
+
+    def __init__(self, pool_size: int = 5, cooldown: float = 10, idle_seconds: float = 30,
+                 path: Optional[str] = None):
+        self.pool_size = max(1, pool_size)
+        self.cooldown = cooldown
+        self.idle_seconds = idle_seconds
+        self.path = path or os.path.join(PLUGIN_DATA_DIR, "flavor_pools.json")
+        self.llm_utils: Optional[LLMUtils] = None
+        self._pools: Dict[PoolKey, Deque[str]] = defaultdict(deque)
+        self._wanted: Set[PoolKey] = set()
+        self._last_activity = 0.0
+        self._dirty = False
+        self._task: Optional[asyncio.Task] = None
+
+    def configure(self, llm_utils: Optional[LLMUtils] = None, pool_size: Optional[int] = None,
+                  cooldown: Optional[float] = None, idle_seconds: Optional[float] = None):
+        if llm_utils is not None:
+            self.llm_utils = llm_utils
+        if pool_size is not None:
+            self.pool_size = max(1, pool_size)
+        if cooldown is not None:
+            self.cooldown = cooldown
+        if idle_seconds is not None:
+            self.idle_seconds = idle_seconds
+
+    def want(self, keys: Iterable[PoolKey]):
+        """登记需要预生成的文案键"""
+        self._wanted.update(keys)
+
+    def pop(self, location: str, event_type: str) -> Optional[str]:
+        """取出一条预生成文案，池为空时返回 None（并登记该键以便后台补充）"""
+        self._last_activity = time.monotonic()
+        key = (location, event_type)
+        self._wanted.add(key)
+        pool = self._pools.get(key)
+        if not pool:
+            return None
+        self._dirty = True
+        return pool.popleft()
+
+    async def _generate(self, key: PoolKey) -> Optional[str]:
+        location, event_type = key
+        if event_type in ("tribulation_success", "tribulation_failure"):
+            outcome = "成功渡过" if event_type == "tribulation_success" else "未能渡过"
+            prompt = f"为一名修士{outcome}{location}的场景，生成一段富有仙侠小说风格的生动描述。"
+            return await self.llm_utils.generate_text(prompt, 100)
+        return await self.llm_utils.generate_exploration_description(location, event_type)
+
+    def _next_key(self) -> Optional[PoolKey]:
+        candidates = [key for key in self._wanted if len(self._pools[key]) < self.pool_size]
+        if not candidates:
+            return None
+        lowest = min(len(self._pools[key]) for key in candidates)
+        return random.choice([key for key in candidates if len(self._pools[key]) == lowest])
+
+    async def refill_once(self) -> bool:
+        """为最缺文案的键补充一条，返回是否补充成功"""
+        key = self._next_key()
+        if key is None or self.llm_utils is None:
+            return False
+        try:
+            text = await self._generate(key)
+        except Exception as e:
+            logger.debug(f"预生成文案失败 {key}: {e!r}")
+            return False
+        if not text or text in UNUSABLE_TEXTS:
+            return False
+        self._pools[key].append(text)
+        self._dirty = True
+        return True
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.cooldown)
+            if time.monotonic() - self._last_activity < self.idle_seconds:
+                continue
+            await self.refill_once()
+            if self._dirty:
+                await self.save()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取文案池失败: {e}")
+            return
+        for raw_key, texts in data.items():
+            # 旧版文件的键带有第三段（境界），直接忽略
+            key = tuple(raw_key.split("|")[:2])
+            texts = [text for text in texts if text and text not in UNUSABLE_TEXTS]
+            if len(key) == 2 and texts:
+                pool = self._pools[key]
+                pool.extend(texts[:self.pool_size - len(pool)])
+                self._wanted.add(key)
+
+    def _write(self, data: Dict[str, list]):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    async def save(self):
+        data = {"|".join(key): list(pool) for key, pool in self._pools.items() if pool}
+        self._dirty = False
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self._write, data)
+        except OSError as e:
+            logger.warning(f"保存文案池失败: {e}")
+            self._dirty = True
+
+    def start(self):
+        if self._task is None:
+            self.load()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._dirty:
+            await self.save()
+
+
+# 全局共享的文案池，由插件注入 LLM 并启动后台补充
+flavor_pool = FlavorTextPool()
@@ -0,0 +1,59 @@
+# astrbot_plugin_cultivation/systems/flavor_text.py
+
+import asyncio
+from typing import Awaitable, Optional, Tuple
+from astrbot.api import logger
+
+
+class FlavorTextDispatcher:
+    """
+    LLM 文案调度。
+    - 同步模式：直接等待 LLM 文案，与原有行为一致
+    - 异步模式：文案在后台任务中生成，结算结果立即返回，
+      文案作为后续消息发送，超过 timeout 秒仍未生成则丢弃
+    只有会把 description_task 交给 wait() 的指令才能使用异步模式，目前只有 /战斗 的攻击文案；
+    修炼、突破、探索的结果经由 commands 层返回，该层不转发后台任务，因此这些文案始终同步生成。
+    """
+
+    def __init__(self, enabled: bool = False, timeout: float = 30):
+        self.enabled = enabled
+        self.timeout = timeout
+
+    def configure(self, enabled: Optional[bool] = None, timeout: Optional[float] = None):
+        if enabled is not None:
+            self.enabled = enabled
+        if timeout is not None:
+            self.timeout = timeout
+
+    @staticmethod
+    def _consume_result(task: asyncio.Task):
+        # 无人等待的任务也要取走异常，避免 “Task exception was never retrieved”
+        if not task.cancelled() and task.exception():
+            logger.debug(f"后台文案生成失败: {task.exception()!r}")
+
+    async def describe(self, coro: Awaitable[str]) -> Tuple[str, Optional[asyncio.Task]]:
+        """
+        返回 (文案, 后台任务)。同步模式下文案直接可用、任务为 None；
+        异步模式下文案为空字符串，由调用方把任务交给 wait() 取得后续文案。
+        """
+        if not self.enabled:
+            return await coro, None
+        task = asyncio.create_task(asyncio.wait_for(coro, timeout=self.timeout))
+        task.add_done_callback(self._consume_result)
+        return "", task
+
+    async def wait(self, task: Optional[asyncio.Task]) -> Optional[str]:
+        """等待后台文案，超时或失败时返回 None"""
+        if task is None:
+            return None
+        try:
+            return await task or None
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            return None
+        except Exception as e:
+            logger.debug(f"后台文案生成失败: {e!r}")
+            return None
+
+
+# 全局共享的文案调度器，由插件根据配置开启异步模式
+flavor_text = FlavorTextDispatcher()
@@ -1,13 +1,28 @@
 # astrbot_plugin_cultivation/systems/gathering_system.py
 import time
 import random
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from ..models.character import Character
 from ..utils.constants import GATHERING_DATA # 確保 GATHERING_DATA 能被正確加載
+from .sampling import AliasTable
 
 class GatheringSystem:
+    # 采集配置只在插件加載時讀取一次，首次訪問時構建各地點的抽樣表
+    _tables: Optional[Dict[str, Optional[AliasTable]]] = None
+
     def __init__(self, db_manager):
         self.db_manager = db_manager
+        self.get_table("")  # 加載時即構建各地點的抽樣表
+
+    @classmethod
+    def get_table(cls, location_name: str) -> Optional[AliasTable]:
+        """取該地點預先構建的采集物品抽樣表，沒有可采集物品時為 None"""
+        if cls._tables is None:
+            cls._tables = {
+                name: AliasTable(info["items"]) if any(w > 0 for w in info.get("items", {}).values()) else None
+                for name, info in GATHERING_DATA.items()
+            }
+        return cls._tables.get(location_name)
 
     async def perform_gathering(self, character: Character) -> Dict[str, Any]:
         location_name = character.location
@@ -27,20 +42,9 @@ class GatheringSystem:
         character.stats.last_gathering = int(time.time())
 
         gathered_items = []
-        # 隨機獲取1-3種物品
-        num_items_to_gather = random.randint(1, 3)
-        
-        # 根據權重隨機選擇多種不重複的物品
-        items = list(gather_info["items"].keys())
-        weights = list(gather_info["items"].values())
-        
-        # 確保選擇的物品數量不超過可用的物品種類
-        num_items_to_gather = min(num_items_to_gather, len(items))
-        
-        chosen_items = random.choices(items, weights=weights, k=num_items_to_gather)
-        
-        # 移除重複的選擇，確保每種物品只添加一次
-        chosen_items = list(set(chosen_items))
+        # 根據權重隨機選擇1-3種不重複的物品 (不超過可用的物品種類)
+        table = self.get_table(location_name)
+        chosen_items = table.sample_distinct(random.randint(1, 3)) if table else []
 
         for chosen_item in chosen_items:
             quantity = 1
@@ -0,0 +1,256 @@
+# astrbot_plugin_cultivation/systems/idle_progress.py
+
+import asyncio
+import math
+import time
+from typing import Any, Dict, NamedTuple, Optional, Set, Tuple
+from astrbot.api import logger
+from ..models.character import Character
+from ..utils.constants import CULTIVATION_SETTINGS
+from .combat_session import combat_sessions
+from .sqlite_store import SideTableStore, side_store
+
+# 闭关期间拒绝外出探索、战斗、采集与炼制类指令时的提示
+IN_RETREAT_MESSAGE = "你正在闭关中，请先 /出关。"
+
+
+class IdleState:
+    """单个角色的挂机状态：真元 / 生命的结算时间点 + 闭关开始时间与闭关期间的每小时经验"""
+
+    __slots__ = ("qi_since", "hp_since", "retreat_since", "exp_rate")
+
+    def __init__(self, qi_since: float, hp_since: float, retreat_since: float = 0.0, exp_rate: float = 0.0):
+        self.qi_since = qi_since
+        self.hp_since = hp_since
+        self.retreat_since = retreat_since
+        self.exp_rate = exp_rate
+
+    @property
+    def retreating(self) -> bool:
+        return self.retreat_since > 0
+
+
+class IdleView(NamedTuple):
+    qi: int
+    qi_since: float
+    hp: int
+    hp_since: float
+    retreat_hours: float
+    retreat_exp: int
+
+
+class IdleProgressEngine:
+    """
+    挂机收益的惰性结算。
+    角色只记录真元 / 生命的结算时间点和闭关时的经验速率，真元、生命的恢复与闭关经验都在读取角色时按公式一次算出，
+    没有任何定时任务去逐个处理不活跃的玩家。
+    - 结算时间点在首次读取角色时于内存中建立，只有真元、生命确有恢复或闭关开始 / 结束时才写库；
+      满值期间前移结算时间点只在内存中进行，插件重启后至多多算一段满值期间的恢复（不超过恢复满所需的时长）
+    - 战斗中（内存中有会话或角色带有战斗检查点）不结算，结算时间点随之前移，战斗期间不积累恢复
+    - 真元 / 生命：每小时恢复上限的 regen 比例，封顶为上限
+    - 闭关经验：开始闭关时按 perform_cultivation 的基础经验公式与灵根效率定下每小时经验；
+      不足 retreat_min_hours 没有收益，超过 retreat_max_efficiency_hours 后效率按半衰期 = 该时长指数递减，
+      总收益有上限
+    """
+
+    def __init__(self, store: SideTableStore, qi_regen_per_hour: float = 0.25, hp_regen_per_hour: float = 0.25,
+                 retreat_sessions_per_hour: float = 2, retreat_min_hours: float = 0.5,
+                 retreat_max_efficiency_hours: float = 12, flush_interval: float = 5):
+        self.store = store
+        self.qi_regen_per_hour = qi_regen_per_hour
+        self.hp_regen_per_hour = hp_regen_per_hour
+        self.retreat_sessions_per_hour = retreat_sessions_per_hour
+        self.retreat_min_hours = retreat_min_hours
+        self.retreat_max_efficiency_hours = retreat_max_efficiency_hours
+        self.flush_interval = flush_interval
+        self._states: Dict[str, IdleState] = {}
+        self._dirty: Set[str] = set()
+        self._task: Optional[asyncio.Task] = None
+
+    def configure(self, **settings: Any):
+        for name, value in settings.items():
+            if value is not None and hasattr(self, name):
+                setattr(self, name, value)
+
+    async def load(self):
+        await self.store.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS idle_progress (
+                user_id TEXT PRIMARY KEY,
+                qi_since REAL NOT NULL,
+                hp_since REAL NOT NULL,
+                retreat_since REAL NOT NULL,
+                exp_rate REAL NOT NULL
+            );
+            """
+        )
+        for user_id, *values in await self.store.fetchall(
+            "SELECT user_id, qi_since, hp_since, retreat_since, exp_rate FROM idle_progress"
+        ):
+            self._states[user_id] = IdleState(*values)
+
+    # --- 公式 ---
+
+    def retreat_exp_rate(self, character: Character) -> float:
+        """闭关每小时经验：与 /修炼 单次基础经验相同的公式 × 灵根效率 × 每小时折算次数"""
+        base_exp = CULTIVATION_SETTINGS["base_exp_gain"] + character.level * CULTIVATION_SETTINGS["exp_gain_level_multiplier"]
+        return base_exp * character.get_spirit_root_efficiency() * self.retreat_sessions_per_hour
+
+    def effective_hours(self, hours: float) -> float:
+        """闭关时长折算为满效率时长"""
+        if hours < self.retreat_min_hours:
+            return 0.0
+        cap = self.retreat_max_efficiency_hours
+        if cap <= 0 or hours <= cap:
+            return hours
+        # ∫ 2^(-s/cap) ds，s 从 0 到 hours - cap
+        return cap + cap / math.log(2) * (1 - 2 ** (-(hours - cap) / cap))
+
+    @staticmethod
+    def _regen(current: int, maximum: int, rate_per_hour: float, since: float, now: float) -> Tuple[int, float]:
+        """
+        返回 (恢复后的数值, 新的结算时间点)。
+        只把已满一点的恢复计入，结算时间点只前移这些点数对应的时长，不足一点的进度留待下次，
+        因此频繁读取不会吞掉恢复量。已满时结算时间点直接移到 now，满值期间不积累。
+        """
+        if current >= maximum or rate_per_hour <= 0 or maximum <= 0:
+            return current, now
+        seconds_per_point = 3600 / (maximum * rate_per_hour)
+        gained = int(max(0.0, now - since) / seconds_per_point)
+        if current + gained >= maximum:
+            return maximum, now
+        return current + gained, since + gained * seconds_per_point
+
+    # --- 读取与结算 ---
+
+    def _state(self, user_id: str, now: float) -> IdleState:
+        """取挂机状态，没有时从 now 开始计时；新建的状态只在内存中，等到确有改动才写库"""
+        state = self._states.get(user_id)
+        if state is None:
+            state = self._states[user_id] = IdleState(now, now)
+        return state
+
+    def view(self, user_id: str, character: Character, now: Optional[float] = None) -> IdleView:
+        """不修改角色，返回此刻的真元、生命与闭关累计收益"""
+        now = now or time.time()
+        state = self._states.get(user_id) or IdleState(now, now)
+        stats = character.stats
+        qi, qi_since = self._regen(stats.qi, stats.max_qi, self.qi_regen_per_hour, state.qi_since, now)
+        hp, hp_since = self._regen(stats.hp, stats.max_hp, self.hp_regen_per_hour, state.hp_since, now)
+        retreat_hours = max(0.0, now - state.retreat_since) / 3600 if state.retreating else 0.0
+        return IdleView(
+            qi=qi, qi_since=qi_since, hp=hp, hp_since=hp_since,
+            retreat_hours=retreat_hours,
+            retreat_exp=int(state.exp_rate * self.effective_hours(retreat_hours)),
+        )
+
+    def settle(self, user_id: str, character: Character, now: Optional[float] = None) -> bool:
+        """把离线期间恢复的真元与生命写入角色，返回角色是否被修改"""
+        now = now or time.time()
+        state = self._state(user_id, now)
+        if character.combat_state or combat_sessions.active(user_id):
+            state.qi_since = state.hp_since = now
+            return False
+        snapshot = self.view(user_id, character, now)
+        state.qi_since, state.hp_since = snapshot.qi_since, snapshot.hp_since
+        changed = (snapshot.qi, snapshot.hp) != (character.stats.qi, character.stats.hp)
+        if changed:
+            character.stats.qi, character.stats.hp = snapshot.qi, snapshot.hp
+            self._dirty.add(user_id)
+        return changed
+
+    def is_retreating(self, user_id: str) -> bool:
+        state = self._states.get(user_id)
+        return bool(state and state.retreating)
+
+    def start_retreat(self, user_id: str, character: Character, now: Optional[float] = None) -> Dict[str, Any]:
+        now = now or time.time()
+        self.settle(user_id, character, now)
+        state = self._state(user_id, now)
+        if state.retreating:
+            hours = (now - state.retreat_since) / 3600
+            return {"success": False, "message": f"你已在闭关中（已闭关 {hours:.1f} 小时），使用 /出关 结束闭关。"}
+        state.retreat_since = now
+        state.exp_rate = self.retreat_exp_rate(character)
+        self._dirty.add(user_id)
+        return {
+            "success": True,
+            "message": (
+                f"你寻得一处清幽之地，开始闭关修炼。\n"
+                f"预计每小时可得 {int(state.exp_rate)} 点经验，闭关满 {self.retreat_min_hours:g} 小时方有收益，"
+                f"超过 {self.retreat_max_efficiency_hours:g} 小时后效率递减。"
+            ),
+        }
+
+    def end_retreat(self, user_id: str, character: Character, now: Optional[float] = None) -> Dict[str, Any]:
+        now = now or time.time()
+        self.settle(user_id, character, now)
+        state = self._states.get(user_id)
+        if not state or not state.retreating:
+            return {"success": False, "message": "你当前并未闭关。"}
+        snapshot = self.view(user_id, character, now)
+        state.retreat_since = 0.0
+        state.exp_rate = 0.0
+        self._dirty.add(user_id)
+
+        message = f"【出关】\n\n闭关 {snapshot.retreat_hours:.1f} 小时。\n"
+        if snapshot.retreat_exp <= 0:
+            message += f"闭关时间太短，尚未有所得。(至少需要 {self.retreat_min_hours:g} 小时)"
+            return {"success": True, "exp_gained": 0, "message": message}
+
+        character.exp += snapshot.retreat_exp
+        message += f"获得经验：{snapshot.retreat_exp}点\n当前真元：{character.stats.qi}/{character.stats.max_qi}"
+        level_up_messages = character.level_up()
+        if level_up_messages:
+            message += "\n\n" + "\n".join(level_up_messages)
+        return {"success": True, "exp_gained": snapshot.retreat_exp, "message": message}
+
+    # --- 持久化 ---
+
+    async def flush(self):
+        if not self._dirty:
+            return
+        dirty, self._dirty = self._dirty, set()
+        rows = []
+        for user_id in dirty:
+            state = self._states.get(user_id)
+            if state is not None:
+                rows.append((user_id, state.qi_since, state.hp_since, state.retreat_since, state.exp_rate))
+        try:
+            await self.store.executemany(
+                "INSERT OR REPLACE INTO idle_progress (user_id, qi_since, hp_since, retreat_since, exp_rate) "
+                "VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+        except Exception as e:
+            logger.error(f"挂机进度写入失败: {e}")
+            self._dirty |= dirty
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def start(self):
+        await self.load()
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def reset(self):
+        self._states.clear()
+        self._dirty.clear()
+        await self.store.transaction([("DELETE FROM idle_progress", ())])
+
+
+# 全局共享的挂机收益引擎
+idle_progress = IdleProgressEngine(side_store)
@@ -0,0 +1,48 @@
+# astrbot_plugin_cultivation/systems/inventory.py
+
+from collections import Counter
+from typing import Dict, Iterable, List, Mapping, Union
+from ..models.character import Character
+
+Requirements = Union[Mapping[str, int], Iterable[str]]
+
+
+def as_counts(requirements: Requirements, times: int = 1) -> Dict[str, int]:
+    """把 {物品: 数量} 或物品名列表（每项 1 个，重复项累加）统一为 {物品: 总数量}"""
+    if isinstance(requirements, Mapping):
+        counts = {name: qty * times for name, qty in requirements.items() if qty > 0}
+    else:
+        counts = {name: qty * times for name, qty in Counter(requirements).items()}
+    return counts
+
+
+def held_counts(character: Character) -> Dict[str, int]:
+    """遍历一次储物袋，返回 {物品: 持有数量}"""
+    counts: Dict[str, int] = {}
+    for item in character.inventory:
+        counts[item.name] = counts.get(item.name, 0) + item.quantity
+    return counts
+
+
+def missing_items(character: Character, requirements: Requirements, times: int = 1) -> List[str]:
+    """返回不满足的材料（“名称x数量”），全部满足时为空列表"""
+    return [
+        f"{name}x{qty}"
+        for name, qty in as_counts(requirements, times).items()
+        if not character.has_item(name, qty)
+    ]
+
+
+def consume(character: Character, requirements: Requirements, times: int = 1) -> List[str]:
+    """
+    原子地扣除一整份配方所需的材料。
+    先整体检查，全部满足才逐项扣除；有缺少时不做任何改动，并返回缺少的材料。
+    只保证原子性：每项材料仍各自经过 Character.has_item / remove_item 查找，查找开销取决于角色模型的储物袋结构。
+    """
+    counts = as_counts(requirements, times)
+    missing = [f"{name}x{qty}" for name, qty in counts.items() if not character.has_item(name, qty)]
+    if missing:
+        return missing
+    for name, qty in counts.items():
+        character.remove_item(name, qty)
+    return []
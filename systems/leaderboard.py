@@ -0,0 +1,187 @@
+# astrbot_plugin_cultivation/systems/leaderboard.py
+
+import asyncio
+import time
+from bisect import bisect_left, insort
+from typing import Any, Dict, List, NamedTuple, Optional, Set, Tuple
+from astrbot.api import logger
+from ..models.character import Character
+from .equipment import EquipmentSystem
+from .sqlite_store import SideTableStore, Statement, side_store
+
+
+class RankedIndex:
+    """
+    按排序键维护的有序名单，键越小排名越靠前。
+    更新时先按旧键二分删除再插入；查询名次和前 N 名都不需要整体排序。
+    """
+
+    __slots__ = ("_keys", "_entries")
+
+    def __init__(self):
+        self._keys: Dict[str, tuple] = {}
+        self._entries: List[tuple] = []  # (*key, user_id)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def update(self, user_id: str, key: tuple):
+        old = self._keys.get(user_id)
+        if old == key:
+            return
+        if old is not None:
+            self._remove_entry(old + (user_id,))
+        self._keys[user_id] = key
+        insort(self._entries, key + (user_id,))
+
+    def _remove_entry(self, entry: tuple):
+        index = bisect_left(self._entries, entry)
+        if index < len(self._entries) and self._entries[index] == entry:
+            del self._entries[index]
+
+    def rank(self, user_id: str) -> Optional[int]:
+        """名次（从 1 开始），不在榜上时为 None"""
+        key = self._keys.get(user_id)
+        if key is None:
+            return None
+        return bisect_left(self._entries, key + (user_id,)) + 1
+
+    def top(self, n: int) -> List[str]:
+        return [entry[-1] for entry in self._entries[:n]]
+
+    def clear(self):
+        self._keys.clear()
+        self._entries.clear()
+
+
+class RankEntry(NamedTuple):
+    name: str
+    level: int
+    exp: int
+    power: int
+
+
+class Leaderboard:
+    """
+    等级榜与战力榜的内存索引。
+    - 每次 save_character 时增量更新，不需要扫描全部角色
+    - 角色表是唯一的数据来源：附属 SQLite 表只是榜单缓存，启动时逐批读取即可重建
+    - 只有完整读取过一次角色表（db_manager 提供 iter_characters 时播种）或刚重置过数据，榜单才算完整（complete）；
+      在此之前榜单只收录启用后保存过的角色，/排行榜 仍使用原有的角色表查询
+    """
+
+    def __init__(self, store: SideTableStore, flush_interval: float = 5):
+        self.store = store
+        self.flush_interval = flush_interval
+        self.by_level = RankedIndex()
+        self.by_power = RankedIndex()
+        self._info: Dict[str, RankEntry] = {}
+        self._dirty: Set[str] = set()
+        self._task: Optional[asyncio.Task] = None
+        self.complete = False
+
+    async def load(self):
+        await self.store.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS leaderboard (
+                user_id TEXT PRIMARY KEY,
+                name TEXT NOT NULL,
+                level INTEGER NOT NULL,
+                exp INTEGER NOT NULL,
+                power INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS leaderboard_seeded (
+                seeded_at REAL NOT NULL
+            );
+            """
+        )
+        async for user_id, name, level, exp, power in self.store.iterate(
+            "SELECT user_id, name, level, exp, power FROM leaderboard"
+        ):
+            self._index(user_id, RankEntry(name, level, exp, power))
+        self.complete = bool(await self.store.fetchall("SELECT 1 FROM leaderboard_seeded LIMIT 1"))
+
+    @staticmethod
+    def _mark_complete_rows() -> List[Statement]:
+        return [("DELETE FROM leaderboard_seeded", ()),
+                ("INSERT INTO leaderboard_seeded (seeded_at) VALUES (?)", (time.time(),))]
+
+    async def seed(self, db_manager: Any) -> int:
+        """从角色表逐个读取角色写入榜单并标记为完整，返回读取的角色数；数据库不支持逐行读取时跳过"""
+        iter_characters = getattr(db_manager, "iter_characters", None)
+        if iter_characters is None:
+            logger.info("数据库不支持逐行读取角色，排行榜暂用角色表查询")
+            return 0
+        seeded = 0
+        async for character in iter_characters():
+            self.update(character)
+            seeded += 1
+        await self.flush()
+        await self.store.transaction(self._mark_complete_rows())
+        self.complete = True
+        return seeded
+
+    def _index(self, user_id: str, entry: RankEntry):
+        self._info[user_id] = entry
+        self.by_level.update(user_id, (-entry.level, -entry.exp))
+        self.by_power.update(user_id, (-entry.power, -entry.level))
+
+    def update(self, character: Character):
+        """角色保存时调用；数值未变化时不做任何事"""
+        entry = RankEntry(character.name, character.level, character.exp, EquipmentSystem.calculate_equipment_power(character))
+        if self._info.get(character.user_id) == entry:
+            return
+        self._index(character.user_id, entry)
+        self._dirty.add(character.user_id)
+
+    def top(self, board: RankedIndex, n: int = 10) -> List[Tuple[str, RankEntry]]:
+        return [(user_id, self._info[user_id]) for user_id in board.top(n)]
+
+    async def flush(self):
+        if not self._dirty:
+            return
+        dirty, self._dirty = self._dirty, set()
+        rows = [(user_id,) + tuple(self._info[user_id]) for user_id in dirty if user_id in self._info]
+        try:
+            await self.store.executemany(
+                "INSERT OR REPLACE INTO leaderboard (user_id, name, level, exp, power) VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+        except Exception as e:
+            logger.error(f"排行榜写入失败: {e}")
+            self._dirty |= dirty
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def start(self, db_manager: Any = None):
+        await self.load()
+        if not self.complete and db_manager is not None:
+            await self.seed(db_manager)
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def reset(self):
+        """随角色表一起清空；此时角色表为空，空榜单即是完整的"""
+        self.by_level.clear()
+        self.by_power.clear()
+        self._info.clear()
+        self._dirty.clear()
+        await self.store.transaction([("DELETE FROM leaderboard", ())] + self._mark_complete_rows())
+        self.complete = True
+
+
+# 全局共享的排行榜
+leaderboard = Leaderboard(side_store)
@@ -0,0 +1,142 @@
+# astrbot_plugin_cultivation/systems/llm_batcher.py
+
+import asyncio
+import json
+from typing import Any, List, Optional, Set, Tuple
+from astrbot.api import logger
+from ..utils.llm_utils import LLMUtils
+from .lock_manager import current_sender_id
+
+# (提示词, 长度上限, 等待者, 截止时间, 所属玩家)
+_Pending = Tuple[str, int, asyncio.Future, float, str]
+
+
+class LLMBatcher:
+    """
+    LLM 文案微批处理。
+    在 window 秒内收集多个 generate_text 请求，合并为一个要求返回 JSON 数组的提示词一次发送，
+    再把解析出的各条文案分发给对应的等待者；解析失败或缺项的请求以原玩家的身份单独回退调用。
+    每个请求从入队起只有一个 timeout 秒的截止时间，批量调用与回退调用共用，超时返回空文案。
+    其余方法原样透传。
+    """
+
+    def __init__(self, llm_utils: LLMUtils, window: float = 0.05, max_batch: int = 8, timeout: float = 30):
+        self.llm_utils = llm_utils
+        self.window = window
+        self.max_batch = max(1, max_batch)
+        self.timeout = timeout
+        self._pending: List[_Pending] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._flush_tasks: Set[asyncio.Task] = set()
+        self.batches_sent = 0
+        self.fallbacks = 0
+
+    def __getattr__(self, name: str):
+        return getattr(self.llm_utils, name)
+
+    async def generate_text(self, prompt: str, max_length: int = 100, *args, **kwargs) -> str:
+        if self.max_batch <= 1 or self.window <= 0 or args or kwargs:
+            return await self.llm_utils.generate_text(prompt, max_length, *args, **kwargs)
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((prompt, max_length, future, loop.time() + self.timeout, current_sender_id.get()))
+        if len(self._pending) >= self.max_batch:
+            self._schedule_flush(0)
+        elif self._flush_handle is None:
+            self._schedule_flush(self.window)
+        return await future
+
+    def _schedule_flush(self, delay: float):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+        self._flush_handle = asyncio.get_running_loop().call_later(delay, self._start_flush)
+
+    def _start_flush(self):
+        # 持有任务引用直到完成，避免被垃圾回收
+        task = asyncio.ensure_future(self._flush())
+        self._flush_tasks.add(task)
+        task.add_done_callback(self._flush_tasks.discard)
+
+    async def _flush(self):
+        self._flush_handle = None
+        batch, self._pending = self._pending[:self.max_batch], self._pending[self.max_batch:]
+        if self._pending:
+            self._schedule_flush(self.window)
+        if not batch:
+            return
+        if len(batch) == 1:
+            await asyncio.gather(self._resolve_single(batch[0]))
+            return
+
+        answers: List[Optional[str]] = [None] * len(batch)
+        remaining = min(item[3] for item in batch) - asyncio.get_running_loop().time()
+        try:
+            raw = await asyncio.wait_for(
+                self.llm_utils.generate_text(self._build_prompt(batch), sum(item[1] for item in batch) + 20 * len(batch)),
+                timeout=max(0.0, remaining),
+            )
+            answers = self._parse(raw, len(batch))
+            self.batches_sent += 1
+        except Exception as e:
+            logger.debug(f"批量文案生成失败，逐条回退: {e!r}")
+
+        retries = []
+        for item, answer in zip(batch, answers):
+            future = item[2]
+            if future.done():
+                continue
+            if answer:
+                future.set_result(answer[:item[1]])
+            else:
+                retries.append(self._resolve_single(item))
+        if retries:
+            self.fallbacks += len(retries)
+            await asyncio.gather(*retries)
+
+    async def _resolve_single(self, item: _Pending):
+        """在 gather 创建的独立任务中运行：按原玩家排队，且不超过该请求剩余的时间"""
+        prompt, max_length, future, deadline, sender = item
+        current_sender_id.set(sender)
+        remaining = deadline - asyncio.get_running_loop().time()
+        try:
+            if remaining <= 0:
+                raise asyncio.TimeoutError()
+            result = await asyncio.wait_for(self.llm_utils.generate_text(prompt, max_length), timeout=remaining)
+        except asyncio.TimeoutError:
+            result = ""
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+            return
+        if not future.done():
+            future.set_result(result)
+
+    @staticmethod
+    def _build_prompt(batch: List[_Pending]) -> str:
+        lines = [
+            f"请依次完成以下{len(batch)}个互不相关的文案任务。"
+            f"只输出一个长度为{len(batch)}的JSON字符串数组，第i个元素是第i个任务的文案，不要输出任何其他内容。"
+        ]
+        for index, (prompt, max_length, *_) in enumerate(batch, 1):
+            lines.append(f"{index}. （不超过{max_length}字）{prompt}")
+        return "\n".join(lines)
+
+    @staticmethod
+    def _parse(raw: Any, expected: int) -> List[Optional[str]]:
+        answers: List[Optional[str]] = [None] * expected
+        if not isinstance(raw, str):
+            return answers
+        start, end = raw.find("["), raw.rfind("]")
+        if start < 0 or end <= start:
+            return answers
+        try:
+            parsed = json.loads(raw[start:end + 1])
+        except ValueError:
+            return answers
+        if not isinstance(parsed, list):
+            return answers
+        for index, value in enumerate(parsed[:expected]):
+            if isinstance(value, str) and value.strip():
+                answers[index] = value.strip()
+        return answers
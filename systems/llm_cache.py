@@ -0,0 +1,146 @@
+# astrbot_plugin_cultivation/systems/llm_cache.py
+
+import re
+import time
+from collections import OrderedDict
+from typing import Dict, Any, List, Mapping, Optional, Tuple
+from ..utils.llm_utils import LLMUtils
+
+# LLM 失败时返回的占位文本，不进入缓存
+LLM_FAILURE_TEXTS = ("生成失败，请稍后重试", "LLM服务暂不可用")
+
+
+def is_failure_text(text: Any) -> bool:
+    """LLMUtils 在调用失败时返回的提示文本（可能带有附加的错误信息）"""
+    return isinstance(text, str) and text.startswith(LLM_FAILURE_TEXTS)
+
+
+_NUMBER = r"\d+(?:\.\d+)?"
+TEMPLATE_INSTRUCTION = "\n文案中涉及上述花括号占位符（如{n1}）的地方，请原样保留占位符，不要替换成具体内容。"
+
+
+def to_template(prompt: str, slots: Optional[Mapping[str, Any]] = None) -> Tuple[str, Dict[str, str]]:
+    """
+    把提示词中的专有名词（slots，如人名、怪物名）和数字换成占位符，返回 (模板, {占位符: 原文})。
+    slots 的占位符为 {键名}，数字依出现顺序为 {n1}、{n2}……，同一数字共用一个占位符。
+    """
+    tokens: Dict[str, str] = {}
+    for slot, value in (slots or {}).items():
+        if str(value):
+            tokens[str(value)] = "{" + slot + "}"
+    alternatives = sorted((re.escape(value) for value in tokens), key=len, reverse=True)
+    pattern = re.compile("|".join(alternatives + [_NUMBER]))
+    values: Dict[str, str] = {}
+    numbers = 0
+
+    def _replace(match) -> str:
+        nonlocal numbers
+        text = match.group(0)
+        token = tokens.get(text)
+        if token is None:
+            numbers += 1
+            token = tokens[text] = "{n%d}" % numbers
+        values[token] = text
+        return token
+
+    return pattern.sub(_replace, prompt), values
+
+
+def fill_template(text: str, values: Mapping[str, str]) -> str:
+    for token, value in values.items():
+        text = text.replace(token, value)
+    return text
+
+
+class _PoolEntry:
+    __slots__ = ("variants", "attempts", "cursor", "expires_at")
+
+    def __init__(self, expires_at: float):
+        self.variants: List[str] = []
+        self.attempts = 0
+        self.cursor = 0
+        self.expires_at = expires_at
+
+
+class LLMTextCache:
+    """
+    LLM 文案缓存，以提示词模板为键：人名、数值等换成占位符后相同的提示词共用一个文案池。
+    每个键调用模型 variants 次，保存其中互不相同的文案（模型重复返回同一文案时池里条数会少于 variants），
+    之后轮流复用。键按 LRU 淘汰，整池超过 ttl 秒后过期重建。
+    """
+
+    def __init__(self, max_keys: int = 100, variants: int = 3, ttl: float = 3600):
+        self.max_keys = max(1, max_keys)
+        self.variants = max(1, variants)
+        self.ttl = ttl
+        self._pools: "OrderedDict[Tuple[str, int], _PoolEntry]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Tuple[str, int]) -> Optional[str]:
+        entry = self._pools.get(key)
+        if entry and entry.expires_at <= time.time():
+            del self._pools[key]
+            entry = None
+        if not entry or not entry.variants or entry.attempts < self.variants:
+            self.misses += 1
+            return None
+        self._pools.move_to_end(key)
+        self.hits += 1
+        text = entry.variants[entry.cursor % len(entry.variants)]
+        entry.cursor += 1
+        return text
+
+    def put(self, key: Tuple[str, int], text: str):
+        entry = self._pools.get(key)
+        if entry is None:
+            entry = _PoolEntry(time.time() + self.ttl)
+            self._pools[key] = entry
+        self._pools.move_to_end(key)
+        entry.attempts += 1
+        if text not in entry.variants and len(entry.variants) < self.variants:
+            entry.variants.append(text)
+        while len(self._pools) > self.max_keys:
+            self._pools.popitem(last=False)
+
+    def clear(self):
+        self._pools.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "keys": len(self._pools),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+class CachedLLMUtils:
+    """
+    在 LLMUtils 之前加一层文案缓存，其余方法原样透传。
+    generate_text 把提示词换成模板后查缓存；未命中时让模型按模板生成保留占位符的文案，
+    每次返回前再代入本次调用的人名与数值。
+    """
+
+    def __init__(self, llm_utils: LLMUtils, cache: LLMTextCache):
+        self.llm_utils = llm_utils
+        self.cache = cache
+
+    def __getattr__(self, name: str):
+        return getattr(self.llm_utils, name)
+
+    async def generate_text(self, prompt: str, max_length: int = 100, *args,
+                            slots: Optional[Mapping[str, Any]] = None, **kwargs) -> str:
+        """slots：提示词中需要换成占位符的专有名词，如 {"name": 角色名}；数字会自动换成占位符"""
+        if args or kwargs:
+            return await self.llm_utils.generate_text(prompt, max_length, *args, **kwargs)
+        template, values = to_template(prompt, slots)
+        key = (template, max_length)
+        text = self.cache.get(key)
+        if text is None:
+            text = await self.llm_utils.generate_text(template + TEMPLATE_INSTRUCTION if values else template, max_length)
+            if not text or is_failure_text(text):
+                return text
+            self.cache.put(key, text)
+        return fill_template(text, values)
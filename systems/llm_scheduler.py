@@ -0,0 +1,218 @@
+# astrbot_plugin_cultivation/systems/llm_scheduler.py
+
+import asyncio
+import inspect
+import time
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, List, Optional
+from astrbot.api import logger
+from ..utils.llm_utils import LLMUtils
+from .llm_cache import is_failure_text
+from .lock_manager import current_sender_id
+
+
+class LLMUnavailableError(Exception):
+    """LLM 调用失败（仅在调度器内部传递，调用方拿到的是预设返回值）"""
+
+
+# 熔断 / 超时时各方法的预设返回值。
+# 文案类方法返回空字符串，不把错误提示展示给玩家；调用方见到空文案时省略描述或使用自己的默认文案。
+# 不在表中的方法同样返回空字符串（DEFAULT_FALLBACK），不会向调用方抛出异常
+DEFAULT_FALLBACK = ""
+FALLBACKS: Dict[str, Any] = {
+    "generate_text": "",
+    "generate_random_event": "灵光一闪，你似有所悟，却又说不清道不明。",
+    "generate_treasure_discovery_event": {},
+    "generate_alchemy_recipe": None,
+}
+EXPLORATION_FALLBACKS = {
+    "normal": "你在此地四处探寻，灵气氤氲，一路平静无事。",
+    "monster": "草木无风自动，一股妖气扑面而来！",
+}
+
+
+class CircuitBreaker:
+    """连续失败达到阈值后熔断 reset_timeout 秒，之后放行一次试探请求"""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 60):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+
+    @property
+    def is_open(self) -> bool:
+        if self.opened_at is None:
+            return False
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            # 半开：放行请求，下一次失败会立即重新熔断
+            self.opened_at = None
+            self.failures = self.failure_threshold - 1
+            return False
+        return True
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.failures >= self.failure_threshold and self.opened_at is None:
+            self.opened_at = time.monotonic()
+            logger.warning(f"LLM 连续 {self.failures} 次失败或过慢，熔断 {self.reset_timeout} 秒，期间使用预设文案")
+
+
+class _Job:
+    __slots__ = ("method", "args", "kwargs", "future", "key", "deadline")
+
+    def __init__(self, method: str, args: tuple, kwargs: dict, future: asyncio.Future, key: tuple, deadline: float):
+        self.method = method
+        self.args = args
+        self.kwargs = kwargs
+        self.future = future
+        self.key = key
+        # 合并进来的等待者中最晚的截止时间；过了它没有人还在等
+        self.deadline = deadline
+
+
+class LLMScheduler:
+    """
+    LLM 请求调度器，包在 LLMUtils 外层。
+    - 固定数量的工作协程限制同时进行的 LLM 调用
+    - 按玩家轮转取任务，单个玩家刷屏不会饿死其他人
+    - 相同的在途请求合并为一次调用
+    - 每个请求从提交起只有 llm_timeout 秒（排队 + 执行），超时返回预设文案；排队期间已过期的任务直接丢弃
+    - 调用失败、超时、过慢或返回 LLMUtils 的失败提示都计为失败，连续失败时熔断，所有调用方改用预设文案
+    """
+
+    def __init__(self, llm_utils: LLMUtils, max_concurrency: int = 4, timeout: float = 30,
+                 slow_threshold: Optional[float] = None, breaker: Optional[CircuitBreaker] = None):
+        self.llm_utils = llm_utils
+        self.max_concurrency = max(1, max_concurrency)
+        self.timeout = timeout
+        self.slow_threshold = slow_threshold if slow_threshold is not None else timeout / 2
+        self.breaker = breaker or CircuitBreaker()
+        self._queues: "OrderedDict[str, Deque[_Job]]" = OrderedDict()
+        self._inflight: Dict[tuple, _Job] = {}
+        self._ready: Optional[asyncio.Semaphore] = None
+        self._workers: List[asyncio.Task] = []
+        self.coalesced = 0
+
+    def __getattr__(self, name: str):
+        attr = getattr(self.llm_utils, name)
+        if not inspect.iscoroutinefunction(attr):
+            return attr
+
+        async def _scheduled(*args, **kwargs):
+            return await self.submit(name, *args, **kwargs)
+        return _scheduled
+
+    @staticmethod
+    def _fallback(method: str, args: tuple) -> Any:
+        if method == "generate_exploration_description":
+            event_type = args[1] if len(args) > 1 else "normal"
+            return EXPLORATION_FALLBACKS.get(event_type, EXPLORATION_FALLBACKS["normal"])
+        return FALLBACKS.get(method, DEFAULT_FALLBACK)
+
+    async def submit(self, method: str, *args, **kwargs) -> Any:
+        if self.breaker.is_open:
+            return self._fallback(method, args)
+        if not self._workers:
+            self.start()
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout
+        key = (method, repr(args), repr(sorted(kwargs.items())))
+        job = self._inflight.get(key)
+        if job is not None:
+            self.coalesced += 1
+            job.deadline = max(job.deadline, deadline)
+        else:
+            job = _Job(method, args, kwargs, loop.create_future(), key, deadline)
+            self._inflight[key] = job
+            self._queues.setdefault(current_sender_id.get(), deque()).append(job)
+            self._ready.release()
+
+        try:
+            # shield：单个等待者超时或被取消不会影响合并到同一请求的其他玩家
+            return await asyncio.wait_for(asyncio.shield(job.future), timeout=max(0.0, deadline - loop.time()))
+        except (asyncio.TimeoutError, LLMUnavailableError):
+            return self._fallback(method, args)
+
+    def _next_job(self) -> _Job:
+        sender, queue = next(iter(self._queues.items()))
+        job = queue.popleft()
+        del self._queues[sender]
+        if queue:
+            # 该玩家还有请求，排到队尾
+            self._queues[sender] = queue
+        return job
+
+    async def _worker(self):
+        while True:
+            await self._ready.acquire()
+            job = self._next_job()
+            remaining = job.deadline - asyncio.get_running_loop().time()
+            if remaining <= 0:
+                # 排队期间所有等待者都已超时，不再调用
+                self._inflight.pop(job.key, None)
+                if not job.future.done():
+                    job.future.set_exception(asyncio.TimeoutError())
+                    job.future.exception()  # 等待者已离开，标记异常已读取
+                continue
+            started = time.monotonic()
+            try:
+                result = await asyncio.wait_for(
+                    getattr(self.llm_utils, job.method)(*job.args, **job.kwargs), timeout=remaining
+                )
+                if is_failure_text(result):
+                    raise LLMUnavailableError(f"{job.method}: {result}")
+            except asyncio.CancelledError:
+                job.future.cancel()
+                self._inflight.pop(job.key, None)
+                raise
+            except Exception as e:
+                self.breaker.record_failure()
+                if not job.future.done():
+                    job.future.set_exception(
+                        e if isinstance(e, (asyncio.TimeoutError, LLMUnavailableError))
+                        else LLMUnavailableError(f"{job.method}: {e!r}")
+                    )
+                    job.future.exception()
+            else:
+                if time.monotonic() - started > self.slow_threshold:
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.record_success()
+                if not job.future.done():
+                    job.future.set_result(result)
+            finally:
+                self._inflight.pop(job.key, None)
+
+    def start(self):
+        if not self._workers:
+            self._ready = asyncio.Semaphore(0)
+            self._workers = [asyncio.create_task(self._worker()) for _ in range(self.max_concurrency)]
+
+    async def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        for worker in self._workers:
+            try:
+                await worker
+            except asyncio.CancelledError:
+                pass
+        self._workers = []
+        for queue in self._queues.values():
+            for job in queue:
+                job.future.cancel()
+        self._queues.clear()
+        self._inflight.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "queued": sum(len(q) for q in self._queues.values()),
+            "inflight": len(self._inflight),
+            "coalesced": self.coalesced,
+            "circuit_open": self.breaker.opened_at is not None,
+        }
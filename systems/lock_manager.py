@@ -0,0 +1,41 @@
+# astrbot_plugin_cultivation/systems/lock_manager.py
+
+import asyncio
+import contextvars
+import weakref
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+# 当前指令所属的玩家，供 LLM 调度等下游组件按玩家区分请求
+current_sender_id = contextvars.ContextVar("current_sender_id", default="")
+
+
+class CharacterLockManager:
+    """
+    按玩家划分的锁注册表。
+    同一玩家的指令串行执行（读取→修改→保存不会交错），不同玩家之间完全并行。
+    锁对象只被弱引用持有，玩家空闲后自动回收，无需定时清理。
+    """
+
+    def __init__(self):
+        self._locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+    def get_lock(self, sender_id: str) -> asyncio.Lock:
+        lock = self._locks.get(sender_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._locks[sender_id] = lock
+        return lock
+
+    @asynccontextmanager
+    async def lock(self, sender_id: str) -> AsyncIterator[None]:
+        # 局部变量保持强引用，直到本次指令结束
+        lock = self.get_lock(sender_id)
+        # 不用 reset(token)：指令生成器可能在另一个任务中被关闭，reset 会因上下文不同而抛出 ValueError
+        previous = current_sender_id.get()
+        current_sender_id.set(sender_id)
+        try:
+            async with lock:
+                yield
+        finally:
+            current_sender_id.set(previous)
@@ -6,6 +6,8 @@ from ..database.db_manager import DatabaseManager
 from ..utils.llm_utils import LLMUtils
 from ..models.character import Character
 from ..utils.constants import REALMS, SPIRIT_ROOTS
+from .flavor_pool import flavor_pool
+from .inventory import consume, missing_items
 
 class RealmSystem:
     """境界系统处理类"""
@@ -90,14 +92,12 @@ class RealmSystem:
             }
         
         # 检查必需物品
-        required_items = breakthrough_info["required_items"]
-        if required_items:
-            for item_name in required_items:
-                if not character.has_item(item_name):
-                    return {
-                        "can_breakthrough": False,
-                        "message": f"突破需要 {item_name}，请先获得此物品。"
-                    }
+        missing = missing_items(character, breakthrough_info["required_items"] or ())
+        if missing:
+            return {
+                "can_breakthrough": False,
+                "message": f"突破需要 {', '.join(missing)}，请先获得此物品。"
+            }
         
         return {"can_breakthrough": True}
 
@@ -110,8 +110,7 @@ class RealmSystem:
         character.spirit_stones -= breakthrough_info["spirit_stones_cost"]
         
         # 消耗必需物品
-        for item_name in breakthrough_info["required_items"]:
-            character.remove_item(item_name, 1)
+        consume(character, breakthrough_info["required_items"] or ())
         
         # 计算成功率
         success_rate = self._calculate_breakthrough_success_rate(character, breakthrough_info)
@@ -143,7 +142,9 @@ class RealmSystem:
                         character, old_realm, new_realm, True
                     )
                 except Exception:
-                    # LLM生成失败时使用默认描述
+                    breakthrough_desc = ""
+                if not breakthrough_desc:
+                    # LLM生成失败或不可用时使用默认描述
                     breakthrough_desc = f"{character.name}盘坐修炼，突然间天地灵气疯狂涌入体内。经过一番苦战，终于冲破了境界桎梏，从{old_realm}成功突破至{new_realm}！"
             else:
                 breakthrough_desc = f"突破成功！{character.name}从{old_realm}成功突破至{new_realm}！"
@@ -174,7 +175,9 @@ class RealmSystem:
                         character, old_realm, new_realm, False
                     )
                 except Exception:
-                    # LLM生成失败时使用默认描述
+                    breakthrough_desc = ""
+                if not breakthrough_desc:
+                    # LLM生成失败或不可用时使用默认描述
                     breakthrough_desc = f"{character.name}尝试冲击更高境界，但在关键时刻功力不继，突破失败。虽有遗憾，但此次经历让你对{new_realm}的门槛有了更深理解。"
             else:
                 breakthrough_desc = f"突破失败！{failure_reason}，请继续努力修炼。"
@@ -236,20 +239,22 @@ class RealmSystem:
         
         success = random.random() < final_success_rate
         
-        # 生成渡劫描述
-        tribulation_desc = ""
-        if self.llm_utils:
+        # 生成渡劫描述，优先使用预生成文案
+        tribulation_desc = flavor_pool.pop(tribulation_type, "tribulation_success" if success else "tribulation_failure")
+        if not tribulation_desc and self.llm_utils:
             try:
                 tribulation_desc = await self.llm_utils.generate_tribulation_description(
                     character, tribulation_type, success
                 )
             except Exception:
-                # LLM生成失败时使用默认描述
+                tribulation_desc = ""
+            if not tribulation_desc:
+                # LLM生成失败或不可用时使用默认描述
                 if success:
                     tribulation_desc = f"乌云密布，雷声阵阵。{character.name}毫不畏惧，直面天劫。经过一番惊心动魄的较量，终于成功渡过{tribulation_type}！"
                 else:
                     tribulation_desc = f"{tribulation_type}威力超出预期，{character.name}虽全力应对，但终究功力不足，渡劫失败。好在性命无虞，来日可期。"
-        else:
+        elif not tribulation_desc:
             if success:
                 tribulation_desc = f"成功渡过{tribulation_type}！"
             else:
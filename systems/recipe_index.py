@@ -0,0 +1,88 @@
+# astrbot_plugin_cultivation/systems/recipe_index.py
+
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+from ..models.character import Character
+from ..utils.constants import RECIPES_DATA, ALCHEMY_DATA
+from .inventory import held_counts
+
+FORGE = "锻造"
+ALCHEMY = "炼丹"
+
+
+class RecipeEntry(NamedTuple):
+    kind: str  # FORGE / ALCHEMY
+    name: str
+    materials: Tuple[Tuple[str, int], ...]
+    crafting_level_req: int = 1  # 锻造：所需炼器等级
+    required_realm: Optional[str] = None  # 炼丹：境界限制
+    cost: int = 0  # 炼丹：每炉消耗的灵石
+
+
+class RecipeIndex:
+    """
+    材料 -> 配方 的反向索引，覆盖锻造图纸 (RECIPES_DATA) 与丹方 (ALCHEMY_DATA["pills"])。
+    查询时遍历一次玩家的储物袋，只核对所持材料涉及的配方，
+    并按 /锻造、/炼丹 相同的规则检查炼器等级、境界限制与灵石。
+    道祖创造或恢复新丹方时由 recipe_journal 调用 invalidate() 重建；配方数量变化时也会自动重建。
+    """
+
+    def __init__(self):
+        self._source: Tuple[int, ...] = ()
+        self._by_material: Dict[str, List[RecipeEntry]] = {}
+        self._no_materials: List[RecipeEntry] = []
+
+    def _signature(self) -> Tuple[int, ...]:
+        pills = ALCHEMY_DATA.get("pills", {})
+        return len(RECIPES_DATA), len(pills)
+
+    def _ensure(self):
+        signature = self._signature()
+        if signature == self._source:
+            return
+        self._by_material = {}
+        self._no_materials = []
+        sources = ((FORGE, RECIPES_DATA), (ALCHEMY, ALCHEMY_DATA.get("pills", {})))
+        for kind, recipes in sources:
+            for name, recipe in recipes.items():
+                materials = tuple((material, qty) for material, qty in recipe.get("materials", {}).items() if qty > 0)
+                if kind == FORGE:
+                    entry = RecipeEntry(kind, name, materials, crafting_level_req=recipe.get("crafting_level_req", 1))
+                else:
+                    entry = RecipeEntry(kind, name, materials, required_realm=recipe.get("境界限制"),
+                                        cost=recipe.get("price", 100) // 10)
+                if not materials:
+                    self._no_materials.append(entry)
+                for material, _ in materials:
+                    self._by_material.setdefault(material, []).append(entry)
+        self._source = signature
+
+    def invalidate(self):
+        self._source = ()
+
+    @staticmethod
+    def _meets_requirements(entry: RecipeEntry, character: Character) -> bool:
+        if entry.kind == FORGE:
+            return character.stats.crafting_level >= entry.crafting_level_req
+        major_realm = character.get_major_realm()
+        if entry.required_realm and major_realm != entry.required_realm and major_realm != "道祖":
+            return False
+        return character.spirit_stones >= entry.cost
+
+    def craftable(self, character: Character) -> List[RecipeEntry]:
+        """当前条件下可以制作的全部配方（锻造在前，各自按名称排序）"""
+        self._ensure()
+        held = held_counts(character)
+        candidates: Set[RecipeEntry] = set(self._no_materials)
+        for material in held:
+            candidates.update(self._by_material.get(material, ()))
+        result = [
+            entry for entry in candidates
+            if all(held.get(material, 0) >= qty for material, qty in entry.materials)
+            and self._meets_requirements(entry, character)
+        ]
+        result.sort(key=lambda entry: (entry.kind != FORGE, entry.name))
+        return result
+
+
+# 全局共享的配方索引
+recipe_index = RecipeIndex()
@@ -0,0 +1,157 @@
+# astrbot_plugin_cultivation/systems/recipe_journal.py
+
+import asyncio
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+from astrbot.api import logger
+from ..utils.constants import ALCHEMY_DATA, ITEMS
+from .recipe_index import recipe_index
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+
+
+class RecipeJournal:
+    """
+    道祖创造的新丹方的持久化。
+    - record() 只在内存中登记，不做任何文件读写
+    - 后台任务在 debounce 秒内合并新丹方，追加写入 pills.journal.jsonl（每行一个丹方）
+    - 日志累计 compact_threshold 条或插件停止时，把完整丹方表写入临时文件后原子替换 pills.json，再清空日志
+    - 启动时重放日志中尚未合并的丹方，崩溃前写入日志的丹方不会丢失
+    所有文件操作都在单线程的线程池中串行执行，多个新丹方不会互相覆盖。
+    """
+
+    def __init__(self, data_dir: str = DATA_DIR, debounce: float = 2, compact_threshold: int = 20):
+        self.pills_path = os.path.join(data_dir, "pills.json")
+        self.journal_path = os.path.join(data_dir, "pills.journal.jsonl")
+        self.debounce = debounce
+        self.compact_threshold = compact_threshold
+        self._pending: List[Tuple[str, Dict[str, Any]]] = []
+        self._journaled = 0
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def record(self, pill_name: str, recipe: Dict[str, Any]):
+        """登记一个新丹方（调用方已写入 ALCHEMY_DATA），由后台任务落盘"""
+        self._pending.append((pill_name, recipe))
+        recipe_index.invalidate()
+        if self._wakeup:
+            self._wakeup.set()
+
+    # --- 以下 _ 开头的同步方法只在线程池中执行 ---
+
+    def _read_journal(self) -> List[Tuple[str, Dict[str, Any]]]:
+        entries = []
+        if not os.path.exists(self.journal_path):
+            return entries
+        with open(self.journal_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    entries.append((entry["name"], entry["recipe"]))
+                except (ValueError, KeyError, TypeError):
+                    # 崩溃时写了一半的最后一行
+                    continue
+        return entries
+
+    def _append(self, entries: List[Tuple[str, Dict[str, Any]]]):
+        with open(self.journal_path, "a", encoding="utf-8") as f:
+            for name, recipe in entries:
+                f.write(json.dumps({"name": name, "recipe": recipe}, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _compact(self, pills: Dict[str, Any]):
+        tmp_path = self.pills_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(pills, f, ensure_ascii=False, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.pills_path)
+        # pills.json 已包含日志中的全部丹方，此时清空日志是安全的
+        open(self.journal_path, "w", encoding="utf-8").close()
+
+    async def _run_io(self, fn, *args):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cultivation-recipes")
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    async def load(self):
+        """重放上次未合并的日志，并立即合并"""
+        try:
+            entries = await self._run_io(self._read_journal)
+        except OSError as e:
+            logger.warning(f"读取丹方日志失败: {e}")
+            return
+        if not entries:
+            return
+        pills = ALCHEMY_DATA["pills"]
+        for name, recipe in entries:
+            pills.setdefault(name, recipe)
+            ITEMS.setdefault(name, recipe)
+        recipe_index.invalidate()
+        logger.info(f"从日志恢复了 {len(entries)} 个丹方")
+        self._journaled = len(entries)
+        await self.compact()
+
+    async def write_pending(self):
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, []
+        # 先计数：即使等待期间任务被取消，线程池里的写入仍会完成，停止时也要合并
+        self._journaled += len(pending)
+        try:
+            await self._run_io(self._append, pending)
+        except OSError as e:
+            logger.error(f"写入丹方日志失败: {e}")
+            self._journaled -= len(pending)
+            self._pending = pending + self._pending
+
+    async def compact(self):
+        if not self._journaled:
+            return
+        # 在事件循环线程上取快照，线程池中只做序列化与写盘
+        snapshot = dict(ALCHEMY_DATA["pills"])
+        try:
+            await self._run_io(self._compact, snapshot)
+            self._journaled = 0
+        except OSError as e:
+            logger.error(f"合并丹方日志失败: {e}")
+
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            # 防抖：等待一小段时间，把同一时段创造的丹方合并为一次写入
+            await asyncio.sleep(self.debounce)
+            self._wakeup.clear()
+            await self.write_pending()
+            if self._journaled >= self.compact_threshold:
+                await self.compact()
+
+    async def start(self):
+        await self.load()
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            if self._pending:
+                self._wakeup.set()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.write_pending()
+        await self.compact()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+# 全局共享的丹方日志
+recipe_journal = RecipeJournal()
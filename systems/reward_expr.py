@@ -0,0 +1,135 @@
+# astrbot_plugin_cultivation/systems/reward_expr.py
+
+import ast
+import operator
+import random
+from typing import Any, Callable, Dict, Tuple
+from ..models.character import Character
+
+RewardFn = Callable[[Character], int]
+
+
+class RewardExpressionError(ValueError):
+    """奖励表达式不合法（含不支持的语法、未知变量或函数）"""
+
+
+# 表达式可读取的角色数值；character.xxx / character.stats.xxx 写法同样可用
+VARIABLES: Dict[str, Callable[[Character], Any]] = {
+    "level": lambda c: c.level,
+    "exp": lambda c: c.exp,
+    "spirit_stones": lambda c: c.spirit_stones,
+    "luck": lambda c: c.stats.luck,
+    "attack": lambda c: c.stats.attack,
+    "defense": lambda c: c.stats.defense,
+    "speed": lambda c: c.stats.speed,
+    "hp": lambda c: c.stats.hp,
+    "max_hp": lambda c: c.stats.max_hp,
+    "qi": lambda c: c.stats.qi,
+    "max_qi": lambda c: c.stats.max_qi,
+}
+_ATTRIBUTE_PREFIXES = ("character.stats.", "character.")
+
+FUNCTIONS: Dict[str, Callable[..., Any]] = {
+    "randint": random.randint,
+    "uniform": random.uniform,
+    "random": random.random,
+    "min": min,
+    "max": max,
+    "int": int,
+    "round": round,
+    "abs": abs,
+}
+
+_BINARY_OPS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+}
+_UNARY_OPS = {
+    ast.UAdd: operator.pos,
+    ast.USub: operator.neg,
+}
+
+
+def _dotted_name(node: ast.AST) -> str:
+    parts = []
+    while isinstance(node, ast.Attribute):
+        parts.append(node.attr)
+        node = node.value
+    if not isinstance(node, ast.Name):
+        raise RewardExpressionError("只支持 character.xxx 形式的属性访问")
+    parts.append(node.id)
+    return ".".join(reversed(parts))
+
+
+def _variable(name: str) -> Callable[[Character], Any]:
+    for prefix in _ATTRIBUTE_PREFIXES:
+        if name.startswith(prefix) and name[len(prefix):] in VARIABLES:
+            return VARIABLES[name[len(prefix):]]
+    if name in VARIABLES:
+        return VARIABLES[name]
+    raise RewardExpressionError(f"未知变量: {name}")
+
+
+def _function(name: str) -> Callable[..., Any]:
+    # 兼容旧配置中的 random.randint(...) 写法
+    short = name[len("random."):] if name.startswith("random.") else name
+    if short in FUNCTIONS:
+        return FUNCTIONS[short]
+    raise RewardExpressionError(f"不支持的函数: {name}")
+
+
+def _compile_node(node: ast.AST) -> Callable[[Character], Any]:
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+        value = node.value
+        return lambda c: value
+    if isinstance(node, (ast.Name, ast.Attribute)):
+        return _variable(_dotted_name(node))
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPS:
+        op = _BINARY_OPS[type(node.op)]
+        left, right = _compile_node(node.left), _compile_node(node.right)
+        return lambda c: op(left(c), right(c))
+    if isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY_OPS:
+        op = _UNARY_OPS[type(node.op)]
+        operand = _compile_node(node.operand)
+        return lambda c: op(operand(c))
+    if isinstance(node, ast.Call):
+        if node.keywords:
+            raise RewardExpressionError("函数调用不支持关键字参数")
+        fn = _function(_dotted_name(node.func))
+        args = tuple(_compile_node(arg) for arg in node.args)
+        return lambda c: fn(*(arg(c) for arg in args))
+    raise RewardExpressionError(f"不支持的语法: {type(node).__name__}")
+
+
+_compiled: Dict[str, RewardFn] = {}
+
+
+def compile_expression(source: Any) -> RewardFn:
+    """
+    把奖励表达式编译为 f(character) -> int。
+    支持数字、四则运算、VARIABLES 中的变量和 FUNCTIONS 中的函数，其余一律拒绝。
+    相同文本只编译一次；编译期即检查，求值时不会再因语法问题出错。
+    """
+    if isinstance(source, (int, float)) and not isinstance(source, bool):
+        value = int(source)
+        return lambda c: value
+    if not isinstance(source, str):
+        raise RewardExpressionError(f"奖励表达式必须是数字或字符串: {source!r}")
+    fn = _compiled.get(source)
+    if fn is None:
+        try:
+            tree = ast.parse(source.strip(), mode="eval")
+        except SyntaxError as e:
+            raise RewardExpressionError(f"语法错误: {source!r}") from e
+        body = _compile_node(tree.body)
+        fn = _compiled[source] = lambda c: int(body(c))
+    return fn
+
+
+def compile_fields(reward: Dict[str, Any], fields: Tuple[str, ...]) -> Dict[str, RewardFn]:
+    """编译 reward 中出现的表达式字段"""
+    return {field: compile_expression(reward[field]) for field in fields if field in reward}
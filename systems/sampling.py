@@ -0,0 +1,101 @@
+# astrbot_plugin_cultivation/systems/sampling.py
+
+import random
+from typing import Hashable, List, Mapping, Sequence
+
+
+def binomial(n: int, p: float, rng: random.Random = random) -> int:
+    """n 次独立试验中成功的次数"""
+    if n <= 0 or p <= 0:
+        return 0
+    if p >= 1:
+        return n
+    binomialvariate = getattr(rng, "binomialvariate", None)  # Python 3.12+
+    if binomialvariate is not None:
+        return binomialvariate(n, p)
+    return sum(1 for _ in range(n) if rng.random() < p)
+
+
+def multinomial(n: int, probabilities: Sequence[float], rng: random.Random = random) -> List[int]:
+    """
+    把 n 次试验分配到各档位，返回各档位的次数。
+    probabilities 之和不足 1 的部分视为最后一档之外的“落空”，不计入结果。
+    按档位依次做条件二项抽样，结果与逐次掷骰的分布一致。
+    """
+    counts = []
+    remaining_n, remaining_p = n, 1.0
+    for p in probabilities:
+        if remaining_n <= 0 or remaining_p <= 0:
+            counts.append(0)
+            continue
+        k = binomial(remaining_n, min(1.0, p / remaining_p), rng)
+        counts.append(k)
+        remaining_n -= k
+        remaining_p -= p
+    return counts
+
+
+class AliasTable:
+    """
+    Vose 别名法加权抽样表。
+    构造 O(n)，之后每次抽样 O(1)：先均匀选一列，再按该列的概率决定取本列还是其别名。
+    配置加载时构建一次，反复用于采集、探索等按权重抽取的场景。
+    每条指令只抽取一次（探索）或 1~3 个不同结果（采集），没有批量结算的路径，因此不提供有放回的批量抽样。
+    """
+
+    __slots__ = ("outcomes", "weights", "_prob", "_alias")
+
+    def __init__(self, weights: Mapping[Hashable, float]):
+        positive = [(outcome, weight) for outcome, weight in weights.items() if weight > 0]
+        if not positive:
+            raise ValueError("至少需要一个权重大于0的结果")
+        n = len(positive)
+        total = sum(weight for _, weight in positive)
+        self.outcomes = tuple(outcome for outcome, _ in positive)
+        self.weights = tuple(weight for _, weight in positive)
+        scaled = [weight * n / total for weight in self.weights]
+        prob = [1.0] * n
+        alias = list(range(n))
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            s, l = small.pop(), large.pop()
+            prob[s] = scaled[s]
+            alias[s] = l
+            scaled[l] -= 1.0 - scaled[s]
+            (small if scaled[l] < 1.0 else large).append(l)
+        # 剩余列的概率因浮点误差可能略偏离 1，直接视为 1
+        self._prob = tuple(prob)
+        self._alias = tuple(alias)
+
+    def __len__(self) -> int:
+        return len(self.outcomes)
+
+    def _index(self, rng: random.Random) -> int:
+        column = int(rng.random() * len(self._prob))
+        return column if rng.random() < self._prob[column] else self._alias[column]
+
+    def sample(self, rng: random.Random = random) -> Hashable:
+        return self.outcomes[self._index(rng)]
+
+    def sample_distinct(self, k: int, rng: random.Random = random) -> List[Hashable]:
+        """
+        不放回地按权重抽取 min(k, n) 个不同结果。
+        先用别名表拒绝重复；若权重极不均匀导致重复过多，剩余部分改为在未选结果中逐个按权重抽取。
+        """
+        k = min(k, len(self.outcomes))
+        chosen: List[int] = []
+        seen = set()
+        attempts = 4 * k
+        while len(chosen) < k and attempts > 0:
+            attempts -= 1
+            index = self._index(rng)
+            if index not in seen:
+                seen.add(index)
+                chosen.append(index)
+        while len(chosen) < k:
+            remaining = [i for i in range(len(self.outcomes)) if i not in seen]
+            index = rng.choices(remaining, weights=[self.weights[i] for i in remaining])[0]
+            seen.add(index)
+            chosen.append(index)
+        return [self.outcomes[i] for i in chosen]
@@ -0,0 +1,117 @@
+# astrbot_plugin_cultivation/systems/save_queue.py
+
+import asyncio
+from typing import Dict, List, Optional
+from astrbot.api import logger
+from ..models.character import Character
+from ..database.db_manager import DatabaseManager
+
+
+class SaveQueue:
+    """
+    批量事务写入队列。
+    - 同一角色的多次保存在队列中合并为一次
+    - 每个 tick 提交一次全部待写角色；DatabaseManager 提供 save_characters 时整批放进同一个事务，
+      否则（目前的 DatabaseManager）仍逐个调用 save_character、各自提交，批处理只带来合并重复保存的收益
+    - 入队的保存最迟在 max_latency 秒（加一次事务提交的耗时）内落盘
+    前面还有 CharacterCache 时，角色改动先在缓存中停留至多 flush_interval 秒才会入队，
+    端到端最坏延迟为 flush_interval + max_latency（默认 5 + 1 = 6 秒）。
+    对外暴露与 DatabaseManager 相同的接口，save_character 只负责入队。
+    """
+
+    def __init__(self, db_manager: DatabaseManager, tick: float = 0.2, max_latency: float = 1.0, max_batch: int = 500):
+        self.db_manager = db_manager
+        self.tick = min(tick, max_latency)
+        self.max_latency = max_latency
+        self.max_batch = max(1, max_batch)
+        self._pending: Dict[str, Character] = {}
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.batches_committed = 0
+        self.saves_coalesced = 0
+
+    def __getattr__(self, name: str):
+        return getattr(self.db_manager, name)
+
+    async def get_character(self, user_id: str) -> Optional[Character]:
+        # 尚未提交的角色以队列中的版本为准
+        pending = self._pending.get(user_id)
+        if pending is not None:
+            return pending
+        return await self.db_manager.get_character(user_id)
+
+    async def save_character(self, character: Character):
+        """入队，不等待落盘"""
+        user_id = character.user_id
+        if user_id in self._pending:
+            self.saves_coalesced += 1
+        self._pending[user_id] = character
+        if len(self._pending) >= self.max_batch:
+            self._wakeup.set()
+
+    async def reset_all_data(self):
+        """丢弃队列中尚未提交的角色后再清库，避免重置前的保存在重置后被写回"""
+        async with self._flush_lock:
+            self._pending.clear()
+            self._wakeup.clear()
+            await self.db_manager.reset_all_data()
+
+    async def _commit(self, characters: List[Character]):
+        save_many = getattr(self.db_manager, "save_characters", None)
+        if save_many:
+            # 单事务批量提交
+            await save_many(characters)
+        else:
+            # 没有批量接口时每个角色各自提交一次事务
+            for character in characters:
+                await self.db_manager.save_character(character)
+
+    async def flush(self) -> int:
+        """立即提交当前队列中的全部角色"""
+        async with self._flush_lock:
+            written = 0
+            while self._pending:
+                batch_ids = list(self._pending)[:self.max_batch]
+                batch = {user_id: self._pending.pop(user_id) for user_id in batch_ids}
+                try:
+                    await self._commit(list(batch.values()))
+                except Exception as e:
+                    logger.error(f"批量保存 {len(batch)} 个角色失败: {e}")
+                    # 失败的角色重新入队，但不覆盖期间产生的新版本
+                    for user_id, character in batch.items():
+                        self._pending.setdefault(user_id, character)
+                    raise
+                written += len(batch)
+                self.batches_committed += 1
+            return written
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.tick)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if not self._pending:
+                continue
+            # tick 到达即提交，保证最大延迟不超过 max_latency
+            try:
+                await self.flush()
+            except Exception:
+                await asyncio.sleep(self.tick)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """停止后台任务并同步排空队列"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
@@ -0,0 +1,158 @@
+# astrbot_plugin_cultivation/systems/shop_stock.py
+
+import asyncio
+import time
+from typing import Dict, Optional, Set, Tuple
+from astrbot.api import logger
+from ..utils.constants import SHOPS
+from .sqlite_store import SideTableStore, side_store
+
+StockKey = Tuple[str, str]  # (商店所在地点, 商品名)
+
+
+class StockLedger:
+    """
+    商店库存账本。
+    - 库存保存在内存中，take() 在同一事件循环内“检查并扣减”一步完成，不会超卖
+    - 改动过的库存定时批量写入 SQLite，重启后保留
+    - 每个商店按 restock_interval（秒，默认 default_restock_interval）定时补货到配置中的初始库存
+    """
+
+    def __init__(self, store: SideTableStore, flush_interval: float = 5, default_restock_interval: float = 3600):
+        self.store = store
+        self.flush_interval = flush_interval
+        self.default_restock_interval = default_restock_interval
+        self._stock: Dict[StockKey, int] = {}
+        self._restocked_at: Dict[str, float] = {}
+        self._versions: Dict[str, int] = {}
+        self._dirty: Set[StockKey] = set()
+        self._task: Optional[asyncio.Task] = None
+
+    def configure(self, flush_interval: Optional[float] = None, default_restock_interval: Optional[float] = None):
+        if flush_interval is not None:
+            self.flush_interval = flush_interval
+        if default_restock_interval is not None:
+            self.default_restock_interval = default_restock_interval
+
+    def _initial_stock(self, now: float):
+        for shop_key, shop_info in SHOPS.items():
+            self._restocked_at[shop_key] = now
+            for item in shop_info["inventory"]:
+                self._stock[(shop_key, item["item_name"])] = item["stock"]
+
+    async def load(self):
+        await self.store.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS shop_stock (
+                shop TEXT NOT NULL,
+                item TEXT NOT NULL,
+                stock INTEGER NOT NULL,
+                PRIMARY KEY (shop, item)
+            );
+            CREATE TABLE IF NOT EXISTS shop_restock (
+                shop TEXT PRIMARY KEY,
+                restocked_at REAL NOT NULL
+            );
+            """
+        )
+        self._initial_stock(time.time())
+        for shop_key, item_name, stock in await self.store.fetchall("SELECT shop, item, stock FROM shop_stock"):
+            if (shop_key, item_name) in self._stock:
+                self._stock[(shop_key, item_name)] = stock
+        for shop_key, restocked_at in await self.store.fetchall("SELECT shop, restocked_at FROM shop_restock"):
+            if shop_key in self._restocked_at:
+                self._restocked_at[shop_key] = restocked_at
+
+    def get(self, shop_key: str, item_name: str, default: int = 0) -> int:
+        return self._stock.get((shop_key, item_name), default)
+
+    def version(self, shop_key: str) -> int:
+        """商店库存版本号，每次库存变化递增，用于判断展示缓存是否过期"""
+        return self._versions.get(shop_key, 0)
+
+    def _changed(self, key: StockKey):
+        self._dirty.add(key)
+        self._versions[key[0]] = self._versions.get(key[0], 0) + 1
+
+    def take(self, shop_key: str, item_name: str, quantity: int) -> bool:
+        """库存充足时扣减并返回 True，否则不做任何改动"""
+        key = (shop_key, item_name)
+        stock = self._stock.get(key)
+        if stock is None or quantity <= 0 or stock < quantity:
+            return False
+        self._stock[key] = stock - quantity
+        self._changed(key)
+        return True
+
+    def restock_due(self, now: Optional[float] = None):
+        """补货到期的商店"""
+        now = now or time.time()
+        for shop_key, shop_info in SHOPS.items():
+            interval = shop_info.get("restock_interval", self.default_restock_interval)
+            if interval <= 0 or now - self._restocked_at.get(shop_key, now) < interval:
+                continue
+            for item in shop_info["inventory"]:
+                key = (shop_key, item["item_name"])
+                if self._stock.get(key) != item["stock"]:
+                    self._stock[key] = item["stock"]
+                    self._changed(key)
+            self._restocked_at[shop_key] = now
+            self._dirty.add((shop_key, ""))
+
+    async def flush(self):
+        """把改动过的库存在一个事务中写入数据库"""
+        if not self._dirty:
+            return
+        dirty, self._dirty = self._dirty, set()
+        statements = []
+        for shop_key, item_name in dirty:
+            if item_name:
+                statements.append((
+                    "INSERT OR REPLACE INTO shop_stock (shop, item, stock) VALUES (?, ?, ?)",
+                    (shop_key, item_name, self._stock[(shop_key, item_name)]),
+                ))
+            else:
+                statements.append((
+                    "INSERT OR REPLACE INTO shop_restock (shop, restocked_at) VALUES (?, ?)",
+                    (shop_key, self._restocked_at[shop_key]),
+                ))
+        try:
+            await self.store.transaction(statements)
+        except Exception as e:
+            logger.error(f"商店库存写入失败: {e}")
+            self._dirty |= dirty
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            self.restock_due()
+            await self.flush()
+
+    async def start(self):
+        await self.load()
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def reset(self):
+        """所有商店恢复到配置中的初始库存"""
+        self._stock.clear()
+        self._restocked_at.clear()
+        self._dirty.clear()
+        self._initial_stock(time.time())
+        for shop_key in SHOPS:
+            self._versions[shop_key] = self._versions.get(shop_key, 0) + 1
+        await self.store.transaction([("DELETE FROM shop_stock", ()), ("DELETE FROM shop_restock", ())])
+
+
+# 全局共享的商店库存账本
+stock_ledger = StockLedger(side_store)
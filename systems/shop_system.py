@@ -1,55 +1,95 @@
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from ..models.character import Character
 from ..utils.constants import SHOPS, ITEMS
+from .shop_stock import stock_ledger
+
+
+class ShopCatalog:
+    """单个商店的商品索引：按商品名 O(1) 查找，并缓存渲染好的商品列表（库存变化后自动重新渲染）"""
+
+    __slots__ = ("shop_key", "shop_info", "items", "_text", "_version")
+
+    def __init__(self, shop_key: str, shop_info: Dict[str, Any]):
+        self.shop_key = shop_key
+        self.shop_info = shop_info
+        self.items: Dict[str, Dict[str, Any]] = {item["item_name"]: item for item in shop_info["inventory"]}
+        self._text: Optional[str] = None
+        self._version = -1
+
+    def get(self, item_name: str) -> Optional[Dict[str, Any]]:
+        return self.items.get(item_name)
+
+    def stock_of(self, item: Dict[str, Any]) -> int:
+        return stock_ledger.get(self.shop_key, item["item_name"], item["stock"])
+
+    def render(self) -> str:
+        version = stock_ledger.version(self.shop_key)
+        if self._text is None or self._version != version:
+            lines = [
+                f"【{self.shop_info['name']}】\n\n",
+                "商品列表 (使用 /商店 购买 [商品名] [数量])：\n",
+            ]
+            for item in self.shop_info["inventory"]:
+                lines.append(f"- {item['item_name']}: {item['price']} 灵石 (库存: {self.stock_of(item)})\n")
+            self._text = "".join(lines)
+            self._version = version
+        return self._text
+
 
 class ShopSystem:
     """商店系统"""
 
+    # 地点（SHOPS 的键，与库存账本的键一致）-> ShopCatalog；商店配置只在插件加载时读取一次，首次访问时建好全部索引
+    _catalogs: Optional[Dict[str, ShopCatalog]] = None
+
     def __init__(self, db_manager, llm_utils):
         self.db_manager = db_manager
         self.llm_utils = llm_utils
 
+    @classmethod
+    def get_catalog(cls, location: Optional[str]) -> Optional[ShopCatalog]:
+        if cls._catalogs is None:
+            cls._catalogs = {key: ShopCatalog(key, info) for key, info in SHOPS.items()}
+        return cls._catalogs.get(location)
+
     def get_shop_info(self, location_name: str) -> Dict[str, Any]:
         """获取商店信息"""
         return SHOPS.get(location_name)
 
-    def format_shop_inventory(self, shop_info: Dict[str, Any]) -> str:
-        """格式化商店库存信息"""
+    def format_shop_inventory(self, shop_info: Dict[str, Any], location: Optional[str] = None) -> str:
+        """格式化商店库存信息；未给出地点时按 shop_info 在 SHOPS 中查找"""
         if not shop_info:
             return "此地没有商店。"
-
-        inventory_text = f"【{shop_info['name']}】\n\n"
-        inventory_text += "商品列表 (使用 /商店 购买 [商品名] [数量])：\n"
-        for item in shop_info["inventory"]:
-            inventory_text += f"- {item['item_name']}: {item['price']} 灵石 (库存: {item['stock']})\n"
-        
-        return inventory_text
+        if location is None:
+            location = next((key for key, info in SHOPS.items() if info is shop_info), None)
+        catalog = self.get_catalog(location)
+        if catalog is None:
+            return "此地没有商店。"
+        return catalog.render()
 
     async def buy_item(self, character: Character, item_name: str, quantity: int) -> Dict[str, Any]:
         """购买物品"""
-        shop_info = self.get_shop_info(character.location)
-        if not shop_info:
+        catalog = self.get_catalog(character.location)
+        if catalog is None:
             return {"success": False, "message": "你所在的地方没有商店。"}
 
-        item_to_buy = None
-        for item in shop_info["inventory"]:
-            if item["item_name"] == item_name:
-                item_to_buy = item
-                break
+        shop_info = catalog.shop_info
+        item_to_buy = catalog.get(item_name)
 
         if not item_to_buy:
             return {"success": False, "message": f"“{shop_info['name']}”不销售“{item_name}”。"}
 
-        if item_to_buy["stock"] < quantity:
-            return {"success": False, "message": f"“{item_name}”库存不足，仅剩 {item_to_buy['stock']} 件。"}
-
         total_cost = item_to_buy["price"] * quantity
         if character.spirit_stones < total_cost:
             return {"success": False, "message": f"灵石不足，购买 {quantity} 件“{item_name}”需要 {total_cost} 灵石。"}
 
+        # 原子地检查并扣减库存，多人同时抢购也不会超卖
+        if not stock_ledger.take(catalog.shop_key, item_name, quantity):
+            return {"success": False, "message": f"“{item_name}”库存不足，仅剩 {catalog.stock_of(item_to_buy)} 件。"}
+
         # 更新玩家数据
         character.spirit_stones -= total_cost
-        
+
         item_info = ITEMS.get(item_name, {})
         character.add_item(
             item_name=item_name,
@@ -59,10 +99,7 @@ class ShopSystem:
             effect=item_info.get("effect")
         )
 
-        # 更新库存 (简单实现，不持久化)
-        item_to_buy["stock"] -= quantity
-
         return {
             "success": True,
             "message": f"购买成功！花费 {total_cost} 灵石购买了 {quantity} 件“{item_name}”。"
-        }
\ No newline at end of file
+        }
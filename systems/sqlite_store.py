@@ -0,0 +1,115 @@
+# astrbot_plugin_cultivation/systems/sqlite_store.py
+
+import asyncio
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Sequence, Tuple
+from ..utils.path_utils import PLUGIN_DATA_DIR
+
+Statement = Tuple[str, Sequence[Any]]
+
+
+class SideTableStore:
+    """
+    插件自有的附属数据表（商店库存、拍卖行等），与角色库分开存放在独立的 SQLite 文件中。
+    所有读写都在单线程的线程池中串行执行，不阻塞事件循环。
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.path.join(PLUGIN_DATA_DIR, "cultivation_market.db")
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        return self._conn
+
+    async def _run(self, fn, *args):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cultivation-sqlite")
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def _executescript(self, script: str):
+        conn = self._connect()
+        conn.executescript(script)
+        conn.commit()
+
+    def _fetchall(self, sql: str, params: Sequence[Any]) -> List[tuple]:
+        return self._connect().execute(sql, params).fetchall()
+
+    def _execute(self, sql: str, params: Sequence[Any]) -> sqlite3.Cursor:
+        return self._connect().execute(sql, params)
+
+    def _transaction(self, statements: List[Statement]):
+        conn = self._connect()
+        with conn:
+            for sql, params in statements:
+                conn.execute(sql, params)
+
+    def _add_missing_columns(self, table: str, columns: Dict[str, str]):
+        conn = self._connect()
+        existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+        with conn:
+            for name, declaration in columns.items():
+                if name not in existing:
+                    conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {declaration}")
+
+    def _executemany(self, sql: str, rows: List[Sequence[Any]]):
+        conn = self._connect()
+        with conn:
+            conn.executemany(sql, rows)
+
+    async def executescript(self, script: str):
+        await self._run(self._executescript, script)
+
+    async def add_missing_columns(self, table: str, columns: Dict[str, str]):
+        """为旧版数据表补上后来新增的列（SQLite 的 ADD COLUMN 不支持 IF NOT EXISTS）"""
+        await self._run(self._add_missing_columns, table, columns)
+
+    async def fetchall(self, sql: str, params: Sequence[Any] = ()) -> List[tuple]:
+        return await self._run(self._fetchall, sql, params)
+
+    async def iterate(self, sql: str, params: Sequence[Any] = (), batch_size: int = 500) -> AsyncIterator[tuple]:
+        """逐批读取查询结果，不把全部行一次载入内存"""
+        cursor = await self._run(self._execute, sql, params)
+        try:
+            while True:
+                rows = await self._run(cursor.fetchmany, batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield row
+        finally:
+            await self._run(cursor.close)
+
+    async def transaction(self, statements: Iterable[Statement]):
+        """在同一个事务中执行多条语句"""
+        statements = list(statements)
+        if statements:
+            await self._run(self._transaction, statements)
+
+    async def executemany(self, sql: str, rows: Iterable[Sequence[Any]]):
+        rows = list(rows)
+        if rows:
+            await self._run(self._executemany, sql, rows)
+
+    def _close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    async def close(self):
+        if self._executor is None:
+            return
+        await self._run(self._close)
+        self._executor.shutdown(wait=True)
+        # 插件重载后再次使用时会重新创建线程池和连接
+        self._executor = None
+
+
+# 全局共享的附属数据表存储
+side_store = SideTableStore()